@@ -1,7 +1,7 @@
 
 import React, { useState, useEffect, useCallback } from 'react';
 import type { EmotionData, Track, Emotion, LanguagesResponse } from './types';
-import { API_BASE_URL, EMOTION_POLL_INTERVAL, EMOTION_COLORS, EMOTION_BG_GRADIENTS } from './constants';
+import { API_BASE_URL, EMOTION_RECONNECT_DELAY, EMOTION_COLORS, EMOTION_BG_GRADIENTS } from './constants';
 import Hero from './components/Hero';
 import WebcamCard from './components/WebcamCard';
 import EmotionDisplayCard from './components/EmotionDisplayCard';
@@ -24,19 +24,29 @@ const App: React.FC = () => {
   const [isLoadingLanguages, setIsLoadingLanguages] = useState(true);
 
   useEffect(() => {
-    const fetchEmotion = async () => {
-      try {
-        const response = await fetch(`${API_BASE_URL}/emotion`);
-        if (!response.ok) throw new Error('Failed to fetch emotion data');
-        const data: Partial<EmotionData> = await response.json();
-        const validatedData: EmotionData = {
-          emotion: data.emotion || 'Unknown',
-          confidence: typeof data.confidence === 'number' ? data.confidence : 0,
-        };
-        setEmotionData(validatedData);
-      } catch (err) {
+    // Server pushes an event only when the emotion (or its confidence) changes
+    let source: EventSource | null = null;
+    let reconnectId: ReturnType<typeof setTimeout> | undefined;
+
+    const connectEmotionStream = () => {
+      source = new EventSource(`${API_BASE_URL}/emotion/stream`);
+      source.onmessage = (event) => {
+        try {
+          const data: Partial<EmotionData> = JSON.parse(event.data);
+          const validatedData: EmotionData = {
+            emotion: data.emotion || 'Unknown',
+            confidence: typeof data.confidence === 'number' ? data.confidence : 0,
+          };
+          setEmotionData(validatedData);
+        } catch (err) {
+          setEmotionData({ emotion: 'Unknown', confidence: 0 });
+        }
+      };
+      source.onerror = () => {
         setEmotionData({ emotion: 'Unknown', confidence: 0 });
-      }
+        source?.close();
+        reconnectId = setTimeout(connectEmotionStream, EMOTION_RECONNECT_DELAY);
+      };
     };
     
     const fetchLanguages = async () => {
@@ -62,11 +72,13 @@ const App: React.FC = () => {
       }
     };
 
-    const intervalId = setInterval(fetchEmotion, EMOTION_POLL_INTERVAL);
-    fetchEmotion();
+    connectEmotionStream();
     fetchLanguages();
 
-    return () => clearInterval(intervalId);
+    return () => {
+      clearTimeout(reconnectId);
+      source?.close();
+    };
   }, []);
   
   const handleDiscoverMusic = useCallback(async (langOverride?: string) => {
@@ -2,129 +2,504 @@ from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 import cv2
 import numpy as np
-from collections import deque, Counter
+import os
 import time
+import uuid
 import base64
+import json
+import threading
+import traceback
 
-try:
-    from tensorflow.keras.models import load_model
-except ImportError:
-    from keras.models import load_model
-
+from emotion_pipeline import server_pipeline, EMOTIONS
+from frame_scheduler import InferenceScheduler
+from session_store import SessionStore, LOCAL_SESSION
+from micro_batcher import MicroBatcher, BatchTimeout
+from frame_broadcast import MjpegBroadcaster
+from frame_source import LatestFrameReader, DEFAULT_SOURCE, open_source
+from metrics import REGISTRY, CAPTURE_TO_RESULT_SECONDS
+from inference_service import InferenceClient, InferenceServiceError
+from inference_backends import DEFAULT_BACKEND
 from spotify_helper import SpotifyMoodRecommender, LANGUAGE_CONFIG
-import os
 
 app = Flask(__name__)
 CORS(app)
 
 # ==================== CONFIGURATION ====================
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-SRC_DIR = os.path.join(BASE_DIR, "src")
-MODEL_PATH = os.path.join(SRC_DIR, "model.h5")
-CASCADE_PATH = os.path.join(SRC_DIR, "haarcascade_frontalface_default.xml")
-
-EMOTIONS = ["Angry", "Disgust", "Fear", "Happy", "Sad", "Surprise", "Neutral"]
-WINDOW_SIZE = 30
-CONF_THRESHOLD = 0.40
-
-# Enhanced weights for difficult emotions
-CLASS_WEIGHTS = {
-    "Sad": 1.5,      # Boosted for better detection
-    "Fear": 1.4,     # Boosted for better detection
-    "Disgust": 1.2
-}
-
-# ==================== LOAD MODEL ====================
-print("Loading model...")
-model = load_model(MODEL_PATH, compile=False)
-face_cascade = cv2.CascadeClassifier(CASCADE_PATH)
-print("✅ Model loaded!")
-
-# Initialize Spotify
-try:
-    spotify = SpotifyMoodRecommender()
-    spotify_enabled = True
-except:
-    spotify_enabled = False
-
-# ==================== GLOBAL STATE ====================
-emotion_window = deque(maxlen=WINDOW_SIZE)
-current_emotion = "Neutral"
-cap = cv2.VideoCapture(0)
-
-def apply_clahe(gray_frame):
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-    return clahe.apply(gray_frame)
+INFERENCE_BACKEND = DEFAULT_BACKEND  # keras | direct | tflite | onnx (EMOTION_BACKEND env)
+FRAME_SOURCE = DEFAULT_SOURCE        # webcam | webcam:N | synthetic | image dir | video file (EMOTION_SOURCE env)
+
+# Production: host:port of inference_service.py, which owns the camera,
+# model, sessions and Spotify pools/history for every HTTP worker.
+# Unset = all in this process.
+INFERENCE_SERVICE = os.getenv("EMOTION_INFERENCE_SERVICE")
+
+# Inference runs at most this often; every frame is still streamed
+INFERENCE_FPS = 10.0
+
+# Pause after a capture/inference error before the next frame
+ERROR_BACKOFF = 0.1
+
+# Per-client sessions (X-Session-Id header or session_id param)
+MAX_SESSIONS = 500
+SESSION_IDLE_TIMEOUT = 600.0
+
+# Client uploads (/api/analyze): concurrent requests are coalesced into
+# one forward pass of up to BATCH_MAX_FACES faces, waiting BATCH_WAIT_MS.
+# Oversized bodies and frame counts are rejected before anything is decoded.
+MAX_ANALYZE_FRAMES = 16
+MAX_UPLOAD_BYTES = 32 * 1024 * 1024
+BATCH_MAX_FACES = 32
+BATCH_WAIT_MS = 5.0
+
+# /api/video_feed: each frame is JPEG-encoded once and shared by all
+# viewers; slow viewers skip frames. STREAM_SIZE=(w, h) downscales.
+STREAM_JPEG_QUALITY = 80
+STREAM_SIZE = None
+STREAM_MAX_FPS = 15.0
+
+# /api/emotion/stream pushes an event when the emotion changes or the
+# confidence moves by at least this much; comments keep idle streams open
+STREAM_CONF_DELTA = 0.10
+STREAM_KEEPALIVE = 15.0
+
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
+
+# ==================== PIPELINE ====================
+# Model, cascade and camera load lazily on first use so /api/health and
+# /api/languages respond without waiting for TensorFlow or the webcam
+# Window, thresholds, weights and smoothing: SERVER_PIPELINE in emotion_pipeline.py
+pipeline = server_pipeline(backend=INFERENCE_BACKEND)
+
+sessions = SessionStore(
+    pipeline.make_smoother,
+    max_sessions=MAX_SESSIONS,
+    idle_timeout=SESSION_IDLE_TIMEOUT
+)
+
+# Spotify connects on first use: in service mode HTTP workers never
+# build a client (with its thread pool and session); the service does
+_spotify = None
+_spotify_failed = False
+_spotify_lock = threading.Lock()
+
+def get_spotify():
+    """Spotify recommender, created on first use; None when it can't connect"""
+    global _spotify, _spotify_failed
+    if _spotify is None and not _spotify_failed:
+        with _spotify_lock:
+            if _spotify is None and not _spotify_failed:
+                try:
+                    _spotify = SpotifyMoodRecommender()
+                except Exception as e:
+                    print(f"⚠️ Spotify unavailable: {e}")
+                    _spotify_failed = True
+    return _spotify
+
+# Keep per-(emotion, language) track pools warm in the background
+PREWARM_TRACK_POOLS = True
 
 def detect_emotion_from_frame(frame):
-    """Detect emotion with enhanced preprocessing for Sad and Fear"""
-    global current_emotion, emotion_window
-    
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    
-    # Enhanced preprocessing
-    gray_enhanced = apply_clahe(gray)
-    gray_enhanced = cv2.convertScaleAbs(gray_enhanced, alpha=1.2, beta=10)
-    
-    faces = face_cascade.detectMultiScale(
-        gray_enhanced, 
-        scaleFactor=1.1, 
-        minNeighbors=4, 
-        minSize=(30, 30)
-    )
-    
-    detected_emotion = None
-    confidence = 0.0
-    face_coords = None
-    
-    for (x, y, w, h) in faces:
-        roi = gray_enhanced[y:y+h, x:x+w]
-        roi_resized = cv2.resize(roi, (64, 64))
-        
-        # Additional histogram equalization
-        roi_resized = cv2.equalizeHist(roi_resized)
-        
-        roi_norm = roi_resized.astype("float32") / 255.0
-        roi_input = np.expand_dims(roi_norm, axis=(0, -1))
-        
-        preds = model.predict(roi_input, verbose=0)[0]
-        
-        # Apply class weights
-        preds_weighted = preds.copy()
-        for i, emotion in enumerate(EMOTIONS):
-            if emotion in CLASS_WEIGHTS:
-                preds_weighted[i] *= CLASS_WEIGHTS[emotion]
-        
-        idx = int(np.argmax(preds_weighted))
-        detected_emotion = EMOTIONS[idx]
-        confidence = float(preds[idx])
-        face_coords = (x, y, w, h)
-        
-        # Lower threshold for Sad and Fear
-        adjusted_threshold = CONF_THRESHOLD
-        if detected_emotion in ["Sad", "Fear"]:
-            adjusted_threshold = 0.30
-        
-        if confidence >= adjusted_threshold:
-            emotion_window.append(detected_emotion)
-        
-        if len(emotion_window) >= 8:
-            emotion_counts = Counter(emotion_window)
-            current_emotion = emotion_counts.most_common(1)[0][0]
-        
-        break
-    
-    return detected_emotion, confidence, face_coords
+    """
+    Detect emotions for every face with enhanced preprocessing for Sad and Fear
+
+    All face ROIs are stacked into one batch so a frame costs a single
+    forward pass regardless of how many faces are visible.
+
+    Returns:
+        List of per-face dicts (face_id, emotion, confidence, box, smoothed),
+        largest face first
+    """
+    return pipeline.process_frame(frame)
+
+# ==================== CAPTURE WORKER ====================
+class CaptureWorker:
+    """
+    Single background capture + inference pipeline
+
+    Owns the webcam and runs detection on the frames the scheduler marks
+    as due; the remaining frames are streamed with the last known overlay.
+    HTTP handlers only read the latest published result, so inference cost
+    stays constant no matter how many viewers are connected.
+    """
+
+    def __init__(self, capture, scheduler=None):
+        """
+        Args:
+            capture: LatestFrameReader over the camera (or any frame source)
+            scheduler: InferenceScheduler deciding which frames get inference
+        """
+        self.cap = capture
+        self.scheduler = scheduler or InferenceScheduler(target_fps=INFERENCE_FPS)
+        self.lock = threading.Lock()
+        self.frame_ready = threading.Condition(self.lock)
+        self.running = False
+        self.thread = None
+
+        # Latest published result (guarded by self.lock)
+        self.frame = None
+        self.frame_id = 0
+        self.faces = []
+        self.confidence = 0.0
+        self.last_read = None
+        self.errors = 0
+        self.last_error = None
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2.0)
+
+    def _run(self):
+        while self.running:
+            try:
+                self._step()
+            except Exception as e:
+                # One bad frame must not kill the only capture thread
+                with self.lock:
+                    self.errors += 1
+                    repeated = self.last_error == repr(e)
+                    self.last_error = repr(e)
+                if not repeated:
+                    print(f"⚠️ Capture worker error (frame skipped): {e}")
+                    traceback.print_exc()
+                time.sleep(ERROR_BACKOFF)
+
+    def _step(self):
+        """Read, analyze and publish the newest frame"""
+        # Newest frame only; anything older was already stale
+        frame_id, frame, captured_at = self.cap.read_latest(self.last_read)
+        if frame is None or frame_id == self.last_read:
+            return
+        # Recorded before processing, so a frame that fails is not retried
+        self.last_read = frame_id
+
+        frame = cv2.resize(frame, (640, 480))
+
+        faces = self.faces
+        started = time.perf_counter()
+        if self.scheduler.should_infer(started):
+            faces = detect_emotion_from_frame(frame)
+            self.scheduler.record(started, captured=captured_at)
+            CAPTURE_TO_RESULT_SECONDS.observe(time.perf_counter() - captured_at)
+            if faces:
+                sessions.get(LOCAL_SESSION).set(pipeline.current_emotion, faces[0]['confidence'])
+
+        for face in faces:
+            x, y, w, h = face['box']
+            cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 100), 2)
+            cv2.putText(frame, f"{face['smoothed']} ({face['confidence']:.2f})", 
+                       (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 100), 2)
+
+        with self.frame_ready:
+            self.frame = frame
+            self.frame_id += 1
+            self.faces = faces
+            if faces:
+                self.confidence = faces[0]['confidence']
+            self.frame_ready.notify_all()
+
+    def status(self):
+        """Whether the capture thread is running, and the errors it survived"""
+        with self.lock:
+            return {
+                'alive': self.thread is not None and self.thread.is_alive(),
+                'errors': self.errors,
+                'last_error': self.last_error
+            }
+
+    def latest(self):
+        """Return (frame_id, frame, confidence) of the newest processed frame"""
+        with self.lock:
+            return self.frame_id, self.frame, self.confidence
+
+    def latest_faces(self):
+        """Per-face results of the newest processed frame"""
+        with self.lock:
+            return list(self.faces)
+
+    def wait_for_frame(self, last_id, timeout=1.0):
+        """Block until a frame newer than last_id is published"""
+        with self.frame_ready:
+            self.frame_ready.wait_for(lambda: self.frame_id != last_id, timeout=timeout)
+            return self.frame_id, self.frame, self.confidence
+
+_capture_worker = None
+_capture_worker_lock = threading.Lock()
+
+def get_capture_worker():
+    """Open the webcam, warm up the model and start the worker on first use"""
+    global _capture_worker
+    if _capture_worker is None:
+        with _capture_worker_lock:
+            if _capture_worker is None:
+                pipeline.warmup()
+                worker = CaptureWorker(LatestFrameReader(open_source(FRAME_SOURCE, realtime=True, loop=True)))
+                worker.start()
+                _capture_worker = worker
+    return _capture_worker
+
+_broadcaster = None
+
+def get_broadcaster():
+    """Start the shared MJPEG encoder on first use"""
+    global _broadcaster
+    if _broadcaster is None:
+        worker = get_capture_worker()
+        with _capture_worker_lock:
+            if _broadcaster is None:
+                _broadcaster = MjpegBroadcaster(
+                    worker.wait_for_frame,
+                    quality=STREAM_JPEG_QUALITY,
+                    size=STREAM_SIZE,
+                    max_fps=STREAM_MAX_FPS
+                )
+    return _broadcaster
+
+def get_session_id():
+    """Client session id from header, query string or JSON body"""
+    session_id = (request.headers.get('X-Session-Id')
+                  or request.args.get('session_id')
+                  or request.form.get('session_id'))
+    if not session_id and request.is_json:
+        session_id = (request.get_json(silent=True) or {}).get('session_id')
+    return str(session_id)[:64] if session_id else LOCAL_SESSION
+
+_inference_client = None
+
+def get_inference_client():
+    """Connection to the inference service (production mode)"""
+    global _inference_client
+    if _inference_client is None:
+        with _capture_worker_lock:
+            if _inference_client is None:
+                _inference_client = InferenceClient(INFERENCE_SERVICE)
+    return _inference_client
+
+if INFERENCE_SERVICE:
+    get_inference_client()  # Refuse to start without EMOTION_SERVICE_KEY
+
+def get_session_state(session_id):
+    """Session emotion state, falling back to the webcam for sessions without frames"""
+    if session_id != LOCAL_SESSION:
+        if INFERENCE_SERVICE:
+            state = get_inference_client().session_snapshot(session_id)
+        else:
+            state = sessions.get(session_id).snapshot()
+        if state['observations']:
+            state['source'] = 'client'
+            return state
+
+    if INFERENCE_SERVICE:
+        state = get_inference_client().state()
+    else:
+        get_capture_worker()
+        state = sessions.get(LOCAL_SESSION).snapshot()
+    state['session_id'] = session_id
+    state['source'] = 'webcam'
+    return state
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+def get_batcher():
+    """Start the cross-request micro-batcher on first use"""
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                pipeline.warmup()
+                _batcher = MicroBatcher(pipeline.predict, max_batch=BATCH_MAX_FACES, max_wait_ms=BATCH_WAIT_MS)
+    return _batcher
+
+class TooManyFrames(ValueError):
+    """More frames uploaded than MAX_ANALYZE_FRAMES"""
+
+def decode_uploaded_frames(max_frames=MAX_ANALYZE_FRAMES):
+    """
+    Decode frames from the request body
+
+    Accepts multipart files (any field name, repeatable), a single
+    JPEG/PNG body, or raw 8-bit grayscale bytes sent as
+    application/octet-stream with width/height query params (several
+    frames may be concatenated). Frames are counted before any decoding.
+
+    Returns:
+        List of grayscale frames
+
+    Raises:
+        TooManyFrames: More than max_frames frames were sent
+        ValueError: The body could not be decoded
+    """
+    files = [f for key in request.files for f in request.files.getlist(key)]
+    if len(files) > max_frames:
+        raise TooManyFrames(f'At most {max_frames} frames per request')
+    blobs = [f.read() for f in files]
+
+    if not blobs:
+        data = request.get_data()
+        if request.mimetype == 'application/octet-stream':
+            width = request.args.get('width', type=int)
+            height = request.args.get('height', type=int)
+            if not width or not height or width < 0 or height < 0:
+                raise ValueError('Raw frames need width and height query params')
+            if not data or len(data) % (width * height):
+                raise ValueError('Raw frame size does not match width x height')
+            if len(data) // (width * height) > max_frames:
+                raise TooManyFrames(f'At most {max_frames} frames per request')
+            return list(np.frombuffer(data, dtype=np.uint8).reshape(-1, height, width))
+        if data:
+            blobs = [data]
+
+    frames = []
+    for blob in blobs:
+        frame = cv2.imdecode(np.frombuffer(blob, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+        if frame is None:
+            raise ValueError('Could not decode image')
+        frames.append(frame)
+    return frames
+
+def analyze_frames(session_id, frames):
+    """
+    Run uploaded grayscale frames through the model and update the session
+
+    Returns:
+        (per-frame face results, session snapshot)
+    """
+    session = sessions.get(session_id)
+
+    crops = [pipeline.crop_faces(frame) for frame in frames]
+    preds = get_batcher().predict(np.concatenate([faces for _, faces in crops]))
+    indices, confidences, weighted = pipeline.classify(preds)
+
+    results = []
+    offset = 0
+    for boxes, _ in crops:
+        faces = []
+        for i, box in enumerate(boxes, start=offset):
+            label = EMOTIONS[indices[i]]
+            confidence = float(confidences[i])
+            faces.append({
+                'box': [int(v) for v in box],
+                'emotion': label,
+                'confidence': confidence,
+                'probs': [round(float(p), 4) for p in preds[i]]
+            })
+
+        # Largest face of each frame drives the session's emotion
+        if faces:
+            label, confidence = faces[0]['emotion'], faces[0]['confidence']
+            session.observe(label, weighted[offset], confidence, vote=pipeline.accepts(label, confidence))
+
+        offset += len(boxes)
+        results.append({'faces': faces})
+
+    return results, session.snapshot()
+
+def recommend_tracks(emotion, language, seed=None, session_id=None, playlists=False):
+    """
+    Tracks (and optionally playlists) for an emotion and language
+
+    Returns:
+        (tracks, playlists or None), or None when Spotify isn't connected
+    """
+    spotify = get_spotify()
+    if spotify is None:
+        return None
+    if playlists:
+        # Tracks and playlists are searched in parallel
+        result = spotify.get_recommendations(emotion, limit=8, language=language, seed=seed, session_id=session_id)
+        return result['tracks'], result['playlists']
+    return spotify.get_tracks_for_emotion(emotion, limit=8, language=language, seed=seed, session_id=session_id), None
+
+def spotify_status():
+    """Spotify connection, cache, pool and history figures for /api/health"""
+    spotify = get_spotify()
+    return {
+        'spotify': spotify is not None,
+        'spotify_cache': spotify.cache.stats() if spotify else None,
+        'track_pools': len(spotify.pools) if spotify else 0,
+        'track_history_sessions': len(spotify.history) if spotify else 0
+    }
+
+def wait_for_state(session_id, state, version):
+    """Block until the session (or the webcam it falls back to) moves past version"""
+    if state['source'] == 'webcam':
+        source = get_inference_client() if INFERENCE_SERVICE else sessions.get(LOCAL_SESSION)
+        return source.wait_for_update(version, timeout=STREAM_KEEPALIVE)
+    if INFERENCE_SERVICE:
+        return get_inference_client().wait_for_session(session_id, version, STREAM_KEEPALIVE)
+    return sessions.get(session_id).wait_for_update(version, timeout=STREAM_KEEPALIVE)
 
 # ==================== API ENDPOINTS ====================
 
+@app.errorhandler(InferenceServiceError)
+def inference_service_error(e):
+    return jsonify({'error': str(e)}), 503
+
+@app.errorhandler(BatchTimeout)
+def batch_timeout(e):
+    # Uploads queued faster than the model keeps up; the client may retry
+    return jsonify({'error': f'Inference is overloaded: {e}'}), 503
+
+def emotion_payload(state):
+    """JSON body for /api/emotion and its stream"""
+    if state['source'] != 'webcam':
+        faces = []
+    elif INFERENCE_SERVICE:
+        faces = state['faces']
+    else:
+        faces = get_capture_worker().latest_faces()
+    return {
+        'session_id': state['session_id'],
+        'source': state['source'],
+        'emotion': state['emotion'],
+        'confidence': state['confidence'],
+        'faces': [
+            {
+                'id': face['face_id'],
+                'emotion': face['smoothed'],
+                'confidence': face['confidence'],
+                'box': list(face['box'])
+            }
+            for face in faces
+        ],
+        'timestamp': time.time()
+    }
+
 @app.route('/api/emotion', methods=['GET'])
 def get_emotion():
-    """Get current detected emotion"""
-    return jsonify({
-        'emotion': current_emotion,
-        'timestamp': time.time()
-    })
+    """Get current detected emotion for this session"""
+    return jsonify(emotion_payload(get_session_state(get_session_id())))
+
+@app.route('/api/emotion/stream', methods=['GET'])
+def emotion_stream():
+    """Server-Sent Events: push the session's emotion only when it changes"""
+    session_id = get_session_id()
+
+    def generate():
+        sent = None
+        version = None
+        while True:
+            state = get_session_state(session_id)
+            if (sent is None or state['emotion'] != sent['emotion']
+                    or abs(state['confidence'] - sent['confidence']) >= STREAM_CONF_DELTA):
+                sent = state
+                yield f"data: {json.dumps(emotion_payload(state))}\n\n"
+
+            latest = wait_for_state(session_id, state, version)
+            if latest == version:
+                yield ": keepalive\n\n"
+            version = latest
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/api/languages', methods=['GET'])
 def get_languages():
@@ -138,42 +513,41 @@ def get_languages():
 @app.route('/api/tracks', methods=['POST'])
 def get_tracks():
     """Get music tracks for emotion and language"""
-    data = request.json
-    emotion = data.get('emotion', current_emotion)
+    data = request.get_json(silent=True) or {}
+    session_id = get_session_id()
+    emotion = data.get('emotion') or get_session_state(session_id)['emotion']
     language = data.get('language', 'Mixed')
+    seed = data.get('seed')  # Optional, for reproducible selections
+    if seed is not None and (isinstance(seed, bool) or not isinstance(seed, (int, str))):
+        return jsonify({'error': 'seed must be an integer or a string'}), 400
     
-    if not spotify_enabled:
+    # Pools and served-track history live with the inference service, so
+    # every HTTP worker sees the same per-session history
+    if INFERENCE_SERVICE:
+        result = get_inference_client().recommend_tracks(emotion, language, seed, session_id, bool(data.get('playlists')))
+    else:
+        result = recommend_tracks(emotion, language, seed, session_id, bool(data.get('playlists')))
+    if result is None:
         return jsonify({'error': 'Spotify not connected'}), 500
+    tracks, playlists = result
     
-    tracks = spotify.get_tracks_for_emotion(emotion, limit=8, language=language)
-    return jsonify({
+    response = {
         'emotion': emotion,
         'language': language,
         'tracks': tracks,
         'count': len(tracks)
-    })
+    }
+    if playlists is not None:
+        response['playlists'] = playlists
+    return jsonify(response)
 
 @app.route('/api/video_feed')
 def video_feed():
     """Stream webcam with emotion overlay"""
+    frames = get_inference_client().frames() if INFERENCE_SERVICE else get_broadcaster().frames()
+
     def generate():
-        while True:
-            success, frame = cap.read()
-            if not success:
-                break
-            
-            frame = cv2.resize(frame, (640, 480))
-            detected_emotion, confidence, face_coords = detect_emotion_from_frame(frame)
-            
-            if face_coords:
-                x, y, w, h = face_coords
-                cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 100), 2)
-                cv2.putText(frame, f"{current_emotion} ({confidence:.2f})", 
-                           (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 100), 2)
-            
-            ret, buffer = cv2.imencode('.jpg', frame)
-            frame_bytes = buffer.tobytes()
-            
+        for frame_bytes in frames:
             yield (b'--frame\r\n'
                    b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
     
@@ -182,33 +556,128 @@ def video_feed():
 @app.route('/api/snapshot', methods=['GET'])
 def snapshot():
     """Get current frame as base64"""
-    success, frame = cap.read()
-    if not success:
-        return jsonify({'error': 'Failed to capture'}), 500
+    if INFERENCE_SERVICE:
+        _, jpeg, state = get_inference_client().latest()
+        if jpeg is None:
+            return jsonify({'error': 'Failed to capture'}), 500
+        emotion, confidence = state['emotion'], state['confidence']
+    else:
+        frame_id, frame, confidence = get_capture_worker().latest()
+        if frame is None:
+            return jsonify({'error': 'Failed to capture'}), 500
+        
+        # Same bytes the video feed sent for this frame, if it was streamed
+        jpeg = get_broadcaster().snapshot(frame_id, frame)
+        if jpeg is None:
+            return jsonify({'error': 'Failed to encode frame'}), 500
+        emotion = pipeline.current_emotion
+    frame_base64 = base64.b64encode(jpeg).decode('utf-8')
     
-    frame = cv2.resize(frame, (640, 480))
-    detected_emotion, confidence, face_coords = detect_emotion_from_frame(frame)
+    return jsonify({
+        'image': f'data:image/jpeg;base64,{frame_base64}',
+        'emotion': emotion,
+        'confidence': confidence if confidence else 0.0
+    })
+
+@app.route('/api/analyze', methods=['POST'])
+def analyze():
+    """Analyze client-uploaded frames and update the caller's session"""
+    try:
+        frames = decode_uploaded_frames()
+    except TooManyFrames as e:
+        return jsonify({'error': str(e)}), 413
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    if face_coords:
-        x, y, w, h = face_coords
-        cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 100), 2)
+    if not frames:
+        return jsonify({'error': 'No frames received'}), 400
     
-    ret, buffer = cv2.imencode('.jpg', frame)
-    frame_base64 = base64.b64encode(buffer).decode('utf-8')
+    # Uploads never feed the webcam session; hand out an id instead
+    session_id = get_session_id()
+    if session_id == LOCAL_SESSION:
+        session_id = uuid.uuid4().hex
+    if INFERENCE_SERVICE:
+        results, state = get_inference_client().analyze_frames(session_id, frames)
+    else:
+        results, state = analyze_frames(session_id, frames)
     
     return jsonify({
-        'image': f'data:image/jpeg;base64,{frame_base64}',
-        'emotion': current_emotion,
-        'confidence': confidence if confidence else 0.0
+        'session_id': session_id,
+        'emotion': state['emotion'],
+        'confidence': state['confidence'],
+        'frames': results,
+        'timestamp': time.time()
     })
 
+@REGISTRY.collector
+def collect_inference_metrics():
+    """Scrape-time figures already tracked by the capture worker and session store"""
+    if INFERENCE_SERVICE:
+        return  # Reported by the inference service itself
+    worker = _capture_worker
+    if worker is not None:
+        camera = worker.cap.stats() if hasattr(worker.cap, 'stats') else {}
+        inference = worker.scheduler.stats()
+        yield 'emotion_frames_captured_total', 'counter', 'Frames read from the camera', camera.get('captured_frames')
+        yield 'emotion_frames_dropped_total', 'counter', 'Camera frames replaced before being processed', camera.get('dropped_frames')
+        yield 'emotion_frames_inferred_total', 'counter', 'Frames that ran inference', inference['inferred_frames']
+        yield 'emotion_frames_skipped_total', 'counter', 'Frames shown without inference', inference['skipped_frames']
+        yield 'emotion_inference_fps', 'gauge', 'Measured inferences per second', inference['inference_fps']
+    if _broadcaster is not None:
+        stream = _broadcaster.stats()
+        yield 'emotion_stream_viewers', 'gauge', 'Connected /api/video_feed clients', stream['viewers']
+        yield 'emotion_stream_encoded_total', 'counter', 'JPEG frames encoded', stream['encoded_frames']
+    yield 'emotion_sessions', 'gauge', 'Active client sessions', len(sessions)
+
+@REGISTRY.collector
+def collect_server_metrics():
+    """Scrape-time figures already tracked by the Spotify caches"""
+    if INFERENCE_SERVICE:
+        return  # Spotify runs in the inference service
+    spotify = _spotify  # Scrapes report, but never create, the client
+    if spotify is not None:
+        cache = spotify.cache.stats()
+        yield 'spotify_cache_hits_total', 'counter', 'Search cache hits', cache['hits']
+        yield 'spotify_cache_misses_total', 'counter', 'Search cache misses', cache['misses']
+        yield 'spotify_cache_hit_ratio', 'gauge', 'Search cache hit ratio', cache['hit_ratio']
+        yield 'spotify_track_pools', 'gauge', 'Pre-warmed track pools', len(spotify.pools)
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text-format metrics"""
+    text = REGISTRY.render()
+    if INFERENCE_SERVICE:
+        try:
+            text += get_inference_client().metrics()
+        except InferenceServiceError as e:
+            print(f"⚠️ {e}")
+    return Response(text, mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/health', methods=['GET'])
 def health():
     """Health check"""
+    if INFERENCE_SERVICE:
+        service = get_inference_client().state()
+        capture = {key: service.get(key) for key in ('model_loaded', 'inference', 'camera', 'capture_worker',
+                                                     'video_stream', 'sessions')}
+        capture.update(get_inference_client().spotify_status())
+    else:
+        capture = {
+            'model_loaded': pipeline.loaded,
+            'inference': _capture_worker.scheduler.stats() if _capture_worker else None,
+            'camera': _capture_worker.cap.stats() if _capture_worker else None,
+            'capture_worker': _capture_worker.status() if _capture_worker else None,
+            'video_stream': _broadcaster.stats() if _broadcaster else None,
+            'sessions': len(sessions),
+            **spotify_status()
+        }
+    worker = capture.get('capture_worker')
     return jsonify({
-        'status': 'online',
-        'spotify': spotify_enabled,
+        'status': 'degraded' if worker and not worker['alive'] else 'online',
         'model': 'Mini-XCEPTION (Enhanced)',
+        'backend': pipeline.backend_name,
+        'inference_service': INFERENCE_SERVICE,
+        **capture,
         'emotions': EMOTIONS,
         'languages': list(LANGUAGE_CONFIG.keys())
     })
@@ -220,11 +689,21 @@ if __name__ == '__main__':
     print("API running at: http://localhost:5000")
     print("\nEndpoints:")
     print("  GET  /api/health       - Server status")
+    print("  GET  /api/metrics      - Prometheus metrics")
     print("  GET  /api/emotion      - Current emotion")
+    print("  GET  /api/emotion/stream - Emotion updates (Server-Sent Events)")
     print("  GET  /api/languages    - Available languages")
     print("  POST /api/tracks       - Get music recommendations")
     print("  GET  /api/video_feed   - Live webcam stream")
     print("  GET  /api/snapshot     - Single frame capture")
+    print("  POST /api/analyze      - Analyze client-uploaded frames")
     print("\n💡 Tip: For Sad/Fear, hold expression for 3-5 seconds")
     print("="*70 + "\n")
+    spotify = get_spotify() if PREWARM_TRACK_POOLS and not INFERENCE_SERVICE else None
+    if spotify is not None:
+        spotify.start_prewarm()
+    if INFERENCE_SERVICE:
+        print(f"🔌 Using inference service at {INFERENCE_SERVICE}")
+    else:
+        get_capture_worker()
     app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
\ No newline at end of file
@@ -0,0 +1,240 @@
+"""
+Headless batch emotion analysis over recorded videos and image folders
+
+    python batch_analyze.py session1.mp4 frames_dir/ -o emotions.parquet
+
+A reader thread decodes frames, a process pool runs face detection and
+ROI preprocessing (the CPU-heavy part, so throughput scales with cores),
+and the main process packs faces from many frames into large predict()
+calls. One row is written per detected face (frames without faces get a
+single row with face = -1) to CSV, Parquet or NPZ, picked by extension.
+"""
+import os
+import csv
+import time
+import queue
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from emotion_pipeline import (
+    server_pipeline, FramePreprocessor, FaceDetector, EMOTIONS, FACE_SIZE, CASCADE_PATH
+)
+from frame_source import open_source
+
+# ==================== CONFIGURATION ====================
+CHUNK_FRAMES = 16        # Frames per preprocessing task
+PREDICT_BATCH = 256      # Faces per forward pass
+READ_AHEAD_CHUNKS = 4    # Decoded chunks buffered per worker
+
+NO_FACE = np.full(len(EMOTIONS), np.nan, dtype=np.float32)
+COLUMNS = ["source", "frame", "time", "face", "x", "y", "w", "h"] + EMOTIONS + ["emotion", "confidence"]
+
+# ==================== WORKERS ====================
+_worker = {}
+
+def _init_worker(detect_scale, enhance_contrast, equalize_faces):
+    cv2.setNumThreads(1)  # Parallelism comes from the pool, not OpenCV
+    _worker['preprocessor'] = FramePreprocessor(enhance_contrast, equalize_faces)
+    _worker['detector'] = FaceDetector(cv2.CascadeClassifier(CASCADE_PATH), detect_scale=detect_scale)
+
+def _preprocess_chunk(frames):
+    """Detect faces in each frame -> list of (boxes, owned (N, 64, 64, 1) faces)"""
+    preprocessor, detector = _worker['preprocessor'], _worker['detector']
+    results = []
+    for frame in frames:
+        gray = preprocessor.preprocess(frame)
+        boxes = sorted(detector.detect_full(gray), key=lambda f: f[2] * f[3], reverse=True)
+        if boxes:
+            faces = preprocessor.extract_faces(gray, boxes).copy()
+        else:
+            faces = np.empty((0,) + FACE_SIZE[::-1] + (1,), dtype=np.float32)
+        results.append((boxes, faces))
+    return results
+
+# ==================== READER ====================
+def read_chunks(sources, out, stride=1, max_frames=None, chunk_frames=CHUNK_FRAMES):
+    """
+    Decode every source on this thread into (source, [(index, time)], [frames]) chunks
+
+    Puts None on the queue when all sources are exhausted.
+    """
+    try:
+        for spec in sources:
+            source = open_source(spec)
+            if not source.isOpened():
+                print(f"⚠️ Could not open source: {spec}")
+                continue
+
+            meta, frames, index = [], [], 0
+            while max_frames is None or index < max_frames:
+                ok, frame = source.read()
+                if not ok:
+                    break
+                if index % stride == 0:
+                    meta.append((index, getattr(source, 'position', 0.0)))
+                    frames.append(frame)
+                    if len(frames) == chunk_frames:
+                        out.put((spec, meta, frames))
+                        meta, frames = [], []
+                index += 1
+            if frames:
+                out.put((spec, meta, frames))
+            source.release()
+    finally:
+        out.put(None)
+
+# ==================== OUTPUT ====================
+class ResultTable:
+    """Columnar accumulator for per-face rows"""
+
+    def __init__(self):
+        self.meta = {name: [] for name in ["source", "frame", "time", "face", "x", "y", "w", "h"]}
+        self.probs = []
+        self.frames = 0
+
+    def __len__(self):
+        return len(self.meta["frame"])
+
+    def add(self, source, frame, timestamp, face, box, probs):
+        for name, value in zip(self.meta, (source, frame, timestamp, face) + tuple(box)):
+            self.meta[name].append(value)
+        self.probs.append(probs)
+
+    def columns(self, pipeline):
+        """Dict of column name -> numpy array, labelled with pipeline.classify"""
+        probs = np.asarray(self.probs, dtype=np.float32).reshape(-1, len(EMOTIONS))
+        has_face = ~np.isnan(probs[:, 0])
+        idx, confidence, _ = pipeline.classify(np.nan_to_num(probs))
+
+        cols = {
+            "source": np.asarray(self.meta["source"], dtype=str),
+            "frame": np.asarray(self.meta["frame"], dtype=np.int64),
+            "time": np.asarray(self.meta["time"], dtype=np.float64),
+            "face": np.asarray(self.meta["face"], dtype=np.int16),
+        }
+        for name in ("x", "y", "w", "h"):
+            cols[name] = np.asarray(self.meta[name], dtype=np.int32)
+        for i, emotion in enumerate(EMOTIONS):
+            cols[emotion] = probs[:, i]
+        cols["emotion"] = np.where(has_face, np.asarray(EMOTIONS)[idx], "")
+        cols["confidence"] = np.where(has_face, confidence, np.nan).astype(np.float32)
+        return cols
+
+def write_output(path, cols):
+    """Write columns as .csv, .parquet or .npz (by extension)"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".npz":
+        np.savez_compressed(path, **cols)
+    elif ext == ".parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("❌ Parquet output needs pyarrow (pip install pyarrow)")
+        pq.write_table(pa.table({name: pa.array(values) for name, values in cols.items()}), path)
+    elif ext == ".csv":
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            writer.writerows(zip(*(cols[name].tolist() for name in COLUMNS)))
+    else:
+        raise SystemExit(f"❌ Unknown output format '{ext}' (use .csv, .parquet or .npz)")
+
+# ==================== MAIN ====================
+def analyze(sources, output, workers=None, batch_size=PREDICT_BATCH, stride=1, max_frames=None,
+            detect_scale=1.0, backend=None):
+    """
+    Run the emotion model over recorded sources and write per-face results
+
+    Returns:
+        (frames processed, faces found, elapsed seconds)
+    """
+    workers = workers or os.cpu_count() or 1
+    # Weights and preprocessing as the server; workers run a full cascade
+    # pass on every frame, since chunks are not consecutive footage
+    pipeline = server_pipeline(backend=backend)
+    pipeline.warmup((batch_size,))
+
+    chunks = queue.Queue(maxsize=workers * READ_AHEAD_CHUNKS)
+    reader = threading.Thread(target=read_chunks, args=(sources, chunks, stride, max_frames), daemon=True)
+
+    table = ResultTable()
+    pending_rows, pending_faces, pending_count = [], [], 0
+
+    def flush():
+        nonlocal pending_rows, pending_faces, pending_count
+        preds = pipeline.predict(np.concatenate(pending_faces)) if pending_faces else None
+        offset = 0
+        for spec, frame, timestamp, boxes in pending_rows:
+            if not boxes:
+                # Keep frames without faces so the output covers every frame
+                table.add(spec, frame, timestamp, -1, (0, 0, 0, 0), NO_FACE)
+            for face, box in enumerate(boxes):
+                table.add(spec, frame, timestamp, face, box, preds[offset])
+                offset += 1
+        pending_rows, pending_faces, pending_count = [], [], 0
+
+    def collect(spec, meta, results):
+        nonlocal pending_count
+        for (frame, timestamp), (boxes, faces) in zip(meta, results):
+            table.frames += 1
+            pending_rows.append((spec, frame, timestamp, boxes))
+            if boxes:
+                pending_faces.append(faces)
+                pending_count += len(boxes)
+        if pending_count >= batch_size:
+            flush()
+
+    started = time.perf_counter()
+    reader.start()
+    with ProcessPoolExecutor(workers, initializer=_init_worker,
+                             initargs=(detect_scale, pipeline.enhance_contrast, pipeline.equalize_faces)) as pool:
+        # Bounded in-flight window keeps memory flat and results in order
+        in_flight = deque()
+        while True:
+            chunk = chunks.get()
+            if chunk is None:
+                break
+            spec, meta, frames = chunk
+            in_flight.append((spec, meta, pool.submit(_preprocess_chunk, frames)))
+            if len(in_flight) >= workers * 2:
+                spec, meta, future = in_flight.popleft()
+                collect(spec, meta, future.result())
+        while in_flight:
+            spec, meta, future = in_flight.popleft()
+            collect(spec, meta, future.result())
+    flush()
+    reader.join()
+
+    write_output(output, table.columns(pipeline))
+    faces = int((np.asarray(table.meta["face"]) >= 0).sum()) if len(table) else 0
+    return table.frames, faces, time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch emotion analysis over videos and image folders")
+    parser.add_argument("sources", nargs="+", help="Video files and/or directories of images")
+    parser.add_argument("-o", "--output", default="emotions.csv", help="Output path (.csv, .parquet or .npz)")
+    parser.add_argument("--workers", type=int, default=None, help="Preprocessing processes (default: all cores)")
+    parser.add_argument("--batch-size", type=int, default=PREDICT_BATCH, help="Faces per forward pass")
+    parser.add_argument("--stride", type=int, default=1, help="Analyze every Nth frame")
+    parser.add_argument("--max-frames", type=int, default=None, help="Frames to read per source")
+    parser.add_argument("--detect-scale", type=float, default=1.0, help="Downscale factor for face detection")
+    parser.add_argument("--backend", default=None, help="Inference backend (default EMOTION_BACKEND env)")
+    args = parser.parse_args()
+
+    frames, faces, elapsed = analyze(
+        args.sources, args.output,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        stride=max(1, args.stride),
+        max_frames=args.max_frames,
+        detect_scale=args.detect_scale,
+        backend=args.backend
+    )
+    print(f"✅ {frames} frames, {faces} faces in {elapsed:.2f}s ({frames / max(elapsed, 1e-9):.1f} frames/s) -> {args.output}")
@@ -0,0 +1,143 @@
+"""
+Local stand-in for the Spotify Web API search endpoint
+
+Serves deterministic fake tracks/playlists for GET /v1/search, with
+configurable latency and a fraction of 429 responses (with Retry-After),
+so the API server can be load-tested without network access or quota.
+
+    python benchmarks/fake_spotify.py --port 8900 --latency-ms 80 --rate-429 0.05
+    SPOTIFY_API_PREFIX=http://127.0.0.1:8900/v1 python api_server.py
+"""
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+def _seed(*parts):
+    return int(hashlib.md5("|".join(map(str, parts)).encode()).hexdigest()[:8], 16)
+
+
+def fake_track(query, market, index):
+    rng = random.Random(_seed(query, market, index))
+    artist = f"Artist {rng.randrange(40)}"
+    album_id = f"album{rng.randrange(200)}"
+    track_id = f"{_seed(query, market, index):08x}"
+    return {
+        'id': track_id,
+        'name': f"{query.split()[0].title()} Song {index}",
+        'artists': [{'name': artist}],
+        'album': {
+            'id': album_id,
+            'name': f"Album {album_id[5:]}",
+            'images': [{'url': f"https://i.example/{album_id}/300", 'height': 300}]
+        },
+        'popularity': rng.randrange(100),
+        'preview_url': None,
+        'external_urls': {'spotify': f"https://open.example/track/{track_id}"},
+        'uri': f"spotify:track:{track_id}"
+    }
+
+
+def fake_playlist(query, index):
+    playlist_id = f"{_seed('playlist', query, index):08x}"
+    return {
+        'id': playlist_id,
+        'name': f"{query.title()} Mix {index}",
+        'description': f"Fake playlist for {query}",
+        'images': [{'url': f"https://i.example/{playlist_id}"}],
+        'external_urls': {'spotify': f"https://open.example/playlist/{playlist_id}"},
+        'owner': {'display_name': 'Fake Spotify'},
+        'tracks': {'total': 50}
+    }
+
+
+class FakeSpotifyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        if url.path.rstrip("/") != "/v1/search":
+            return self._send(404, {'error': {'status': 404, 'message': 'Not found'}})
+
+        delay = server.latency + random.uniform(0, server.jitter)
+        if delay:
+            time.sleep(delay)
+
+        with server.lock:
+            server.requests += 1
+            throttled = random.random() < server.rate_429
+            if throttled:
+                server.throttled += 1
+        if throttled:
+            return self._send(429, {'error': {'status': 429, 'message': 'API rate limit exceeded'}},
+                              {'Retry-After': str(server.retry_after)})
+
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        query = params.get('q', '')
+        search_type = params.get('type', 'track')
+        limit = min(int(params.get('limit', 10)), 50)
+        offset = int(params.get('offset', 0))
+        market = params.get('market', 'US')
+
+        if search_type == 'playlist':
+            items = [fake_playlist(query, offset + i) for i in range(limit)]
+        else:
+            items = [fake_track(query, market, offset + i) for i in range(limit)]
+        self._send(200, {search_type + 's': {'items': items, 'offset': offset, 'limit': limit, 'total': 1000}})
+
+
+def start_fake_spotify(port=0, latency_ms=50.0, jitter_ms=20.0, rate_429=0.0, retry_after=1):
+    """
+    Serve the fake API from a background thread
+
+    Returns:
+        The ThreadingHTTPServer (server.server_address has the bound port)
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeSpotifyHandler)
+    server.daemon_threads = True
+    server.latency = latency_ms / 1000.0
+    server.jitter = jitter_ms / 1000.0
+    server.rate_429 = rate_429
+    server.retry_after = retry_after
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.throttled = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds on 429s")
+    args = parser.parse_args()
+
+    server = start_fake_spotify(args.port, args.latency_ms, args.jitter_ms, args.rate_429, args.retry_after)
+    print(f"🎧 Fake Spotify API on http://127.0.0.1:{server.server_address[1]}/v1")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
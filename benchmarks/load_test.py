@@ -0,0 +1,166 @@
+"""
+Load test: throughput and latency per API endpoint at rising concurrency
+
+Each endpoint is hammered on its own by N client threads (one keep-alive
+session and X-Session-Id each) for --duration seconds per concurrency
+level, and requests/s plus p50/p95/p99 latency are reported.
+
+    # Against a running server
+    python benchmarks/load_test.py --url http://127.0.0.1:5000
+
+    # Self-contained: fake Spotify API + api_server on a synthetic camera
+    python benchmarks/load_test.py --spawn --latency-ms 80 --rate-429 0.02 \\
+        --concurrency 1,4,16,64 --endpoints emotion,tracks,snapshot
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+
+import numpy as np
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from fake_spotify import start_fake_spotify
+
+# (method, path, JSON body) per endpoint
+ENDPOINTS = {
+    'emotion': ('GET', '/api/emotion', None),
+    'tracks': ('POST', '/api/tracks', {'emotion': 'Happy', 'language': 'Mixed'}),
+    'snapshot': ('GET', '/api/snapshot', None),
+    'health': ('GET', '/api/health', None),
+}
+PERCENTILES = (50, 95, 99)
+
+
+def client(base_url, endpoint, client_id, deadline, latencies, errors):
+    method, path, body = ENDPOINTS[endpoint]
+    session = requests.Session()
+    session.headers['X-Session-Id'] = f"load-{client_id}"
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = session.request(method, base_url + path, json=body, timeout=30)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - started
+        if ok:
+            latencies.append(elapsed)
+        else:
+            errors.append(elapsed)
+
+
+def run_level(base_url, endpoint, concurrency, duration):
+    """Run one endpoint at one concurrency level -> summary dict"""
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=client, args=(base_url, endpoint, i, deadline, latencies, errors))
+        for i in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    summary = {
+        'endpoint': endpoint,
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': round(len(latencies) / elapsed, 2),
+    }
+    for p in PERCENTILES:
+        summary[f'p{p}_ms'] = round(float(np.percentile(latencies, p)) * 1000, 2) if latencies else None
+    return summary
+
+
+def wait_for_server(base_url, timeout=120.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(base_url + '/api/health', timeout=2).ok:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def spawn_server(args):
+    """Start the fake Spotify API and api_server.py on a synthetic camera"""
+    fake = start_fake_spotify(0, args.latency_ms, args.jitter_ms, args.rate_429)
+    env = dict(os.environ)
+    env['SPOTIFY_API_PREFIX'] = f"http://127.0.0.1:{fake.server_address[1]}/v1"
+    env['EMOTION_SOURCE'] = 'synthetic'
+    print(f"🎧 Fake Spotify API on {env['SPOTIFY_API_PREFIX']}")
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'api_server.py')], cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL if args.quiet else None)
+    return fake, server
+
+
+def print_table(results):
+    print(f"\n  {'endpoint':<10} {'conc':>5} {'req/s':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>7}  ms")
+    for row in results:
+        p = [f"{row[f'p{q}_ms']:9.1f}" if row[f'p{q}_ms'] is not None else f"{'-':>9}" for q in PERCENTILES]
+        print(f"  {row['endpoint']:<10} {row['concurrency']:>5} {row['rps']:9.1f} {' '.join(p)} {row['errors']:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://127.0.0.1:5000", help="API server base URL")
+    parser.add_argument("--spawn", action="store_true", help="Start a fake Spotify API and api_server.py locally")
+    parser.add_argument("--endpoints", default="emotion,tracks,snapshot", help=f"Comma-separated: {', '.join(ENDPOINTS)}")
+    parser.add_argument("--concurrency", default="1,4,16,64", help="Comma-separated client counts")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per endpoint and level")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Fake Spotify latency (--spawn)")
+    parser.add_argument("--jitter-ms", type=float, default=20.0, help="Fake Spotify latency jitter (--spawn)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fake Spotify 429 fraction (--spawn)")
+    parser.add_argument("--quiet", action="store_true", help="Hide the spawned server's output")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    endpoints = [e for e in args.endpoints.split(",") if e]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        raise SystemExit(f"❌ Unknown endpoint(s): {', '.join(sorted(unknown))}")
+    levels = [int(c) for c in args.concurrency.split(",") if c]
+
+    fake = server = None
+    if args.spawn:
+        fake, server = spawn_server(args)
+    try:
+        if not wait_for_server(args.url):
+            raise SystemExit(f"❌ API server not reachable at {args.url}")
+
+        # Let the worker open the camera and the model warm up before timing
+        for endpoint in endpoints:
+            run_level(args.url, endpoint, 1, 1.0)
+
+        results = []
+        for endpoint in endpoints:
+            for concurrency in levels:
+                row = run_level(args.url, endpoint, concurrency, args.duration)
+                results.append(row)
+                print(f"  {endpoint} x{concurrency}: {row['rps']:.1f} req/s, p95 {row['p95_ms']} ms, {row['errors']} errors")
+        print_table(results)
+
+        if fake is not None:
+            print(f"\n🎧 Fake Spotify served {fake.requests} searches ({fake.throttled} throttled)")
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(results, f, indent=2)
+            print(f"💾 Results written to {args.json}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+        if fake is not None:
+            fake.shutdown()
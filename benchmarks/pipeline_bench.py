@@ -0,0 +1,244 @@
+"""
+Benchmark: per-stage latency of the detection pipeline
+
+Runs EmotionPipeline.process_frame with the server's settings over
+synthetic or recorded frames and times, through its stage hook, every
+stage it reports (preprocess, detect, crop, predict, classify) and the
+operations inside them (cvtColor, CLAHE, convertScaleAbs; face resize,
+equalizeHist, normalization; class weighting, tracking + voting). Prints
+p50/p95/p99 per stage plus end-to-end FPS for one or more configurations.
+
+    python benchmarks/pipeline_bench.py --frames 300 --faces 2
+    python benchmarks/pipeline_bench.py --source clip.mp4 \\
+        --config default --config "fast:detect_scale=0.5,min_neighbors=3" \\
+        --config "tflite:backend=tflite"
+    python benchmarks/pipeline_bench.py --save-baseline baseline.json
+    python benchmarks/pipeline_bench.py --baseline baseline.json --tolerance 0.2
+
+Synthetic frames contain no real faces, so --faces boxes are fed to the
+later stages whenever the cascade finds none. With nothing to track,
+detect_interval would change nothing there, so it needs a recorded
+--source. --skip-model replaces the forward pass with a constant output,
+for machines without TensorFlow.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from emotion_pipeline import server_pipeline, FaceDetector, EMOTIONS, CASCADE_PATH
+from inference_backends import load_backend, DEFAULT_BACKEND
+from frame_source import open_source, SyntheticCapture
+from bench_utils import make_boxes
+
+# Stages in process_frame order; indented ones are part of the stage above
+STAGES = ["preprocess", "cvt_color", "clahe", "contrast", "detect", "crop", "resize", "equalize",
+          "normalize", "predict", "classify", "weighting", "vote", "total"]
+SUBSTAGES = {"cvt_color", "clahe", "contrast", "resize", "equalize", "normalize", "weighting", "vote"}
+PERCENTILES = (50, 95, 99)
+NOISE_FLOOR_MS = 0.05  # Smaller slowdowns are timer noise, never a regression
+
+# Config keys and their types; anything else is rejected
+CONFIG_KEYS = {
+    "scale_factor": float,
+    "min_neighbors": int,
+    "detect_scale": float,
+    "detect_interval": int,
+    "backend": str,
+    "batch": int,          # 1 = one forward pass per frame, 0 = one per face
+}
+DEFAULT_CONFIG = {
+    "scale_factor": 1.1,
+    "min_neighbors": 4,
+    "detect_scale": 1.0,
+    "detect_interval": 1,
+    "backend": DEFAULT_BACKEND,
+    "batch": 1,
+}
+
+
+def parse_config(spec):
+    """"name:key=value,key=value" -> (name, settings)"""
+    name, _, params = spec.partition(":")
+    config = dict(DEFAULT_CONFIG)
+    for item in filter(None, params.split(",")):
+        key, _, value = item.partition("=")
+        if key not in CONFIG_KEYS:
+            raise SystemExit(f"❌ Unknown config key '{key}' (choose from {', '.join(CONFIG_KEYS)})")
+        config[key] = CONFIG_KEYS[key](value)
+    return name or "default", config
+
+
+def load_frames(source, count, width, height):
+    """Up to count frames from a frame source spec, resized to width x height"""
+    if source == "synthetic":
+        capture = SyntheticCapture(width, height, realtime=False, max_frames=count)
+    else:
+        capture = open_source(source)
+    frames = []
+    while len(frames) < count:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        if frame.shape[:2] != (height, width):
+            frame = cv2.resize(frame, (width, height))
+        frames.append(frame)
+    capture.release()
+    if not frames:
+        raise SystemExit(f"❌ No frames from source: {source}")
+    return frames
+
+
+class PerFacePredict:
+    """Backend wrapper running one forward pass per face instead of per frame"""
+
+    def __init__(self, model):
+        self.model = model
+
+    def predict(self, batch):
+        return np.concatenate([self.model.predict(batch[i:i + 1]) for i in range(len(batch))])
+
+
+class ConstantPredict:
+    """Uniform predictions, for machines without the model's runtime"""
+
+    def predict(self, batch):
+        return np.full((len(batch), len(EMOTIONS)), 1.0 / len(EMOTIONS), dtype=np.float32)
+
+
+def run_config(config, frames, fallback_boxes, skip_model=False, warmup=10):
+    """
+    Time each process_frame stage per frame for one configuration
+
+    Returns:
+        {stage: [ms per frame]}, frames per second
+    """
+    times = {}
+    pipeline = server_pipeline(
+        detect_interval=config["detect_interval"],
+        detect_scale=config["detect_scale"],
+        backend=config["backend"],
+        stage_hook=lambda stage, seconds: times.__setitem__(stage, seconds * 1000)
+    )
+    detector = FaceDetector(
+        cv2.CascadeClassifier(CASCADE_PATH),
+        detect_interval=config["detect_interval"],
+        detect_scale=config["detect_scale"],
+        scale_factor=config["scale_factor"],
+        min_neighbors=config["min_neighbors"]
+    )
+    # Fallback boxes stand in for faces the cascade can't find
+    detect = detector.detect
+    detector.detect = lambda gray: detect(gray) or fallback_boxes
+    model = ConstantPredict() if skip_model else load_backend(config["backend"])
+    pipeline.face_detector = detector
+    pipeline.model = model if config["batch"] else PerFacePredict(model)
+
+    def step(frame):
+        times.clear()
+        started = time.perf_counter()
+        pipeline.process_frame(frame)
+        times["total"] = (time.perf_counter() - started) * 1000
+        return times
+
+    for frame in frames[:warmup]:
+        step(frame)
+
+    samples = {stage: [] for stage in STAGES}
+    started = time.perf_counter()
+    for frame in frames:
+        for stage, ms in step(frame).items():
+            samples[stage].append(ms)
+    elapsed = time.perf_counter() - started
+    return samples, len(frames) / elapsed
+
+
+def summarize(samples, fps):
+    summary = {
+        stage: {f"p{p}": round(float(np.percentile(values, p)), 4) for p in PERCENTILES}
+        for stage, values in samples.items() if values
+    }
+    summary["fps"] = round(fps, 2)
+    return summary
+
+
+def print_summary(name, config, summary):
+    settings = ", ".join(f"{k}={v}" for k, v in config.items())
+    print(f"\n⏱️  {name} ({settings})")
+    print("=" * 50)
+    print(f"  {'stage':<12} {'p50':>9} {'p95':>9} {'p99':>9}  ms")
+    for stage in filter(summary.__contains__, STAGES):
+        row = summary[stage]
+        label = f"  {stage}" if stage in SUBSTAGES else stage
+        print(f"  {label:<12} {row['p50']:9.3f} {row['p95']:9.3f} {row['p99']:9.3f}")
+    print(f"  {'fps':<12} {summary['fps']:9.1f}")
+
+
+def check_regressions(results, baseline, tolerance):
+    """Messages for every stage p50/p95 or FPS worse than baseline by more than tolerance"""
+    failures = []
+    for name, summary in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for stage in STAGES:
+            if stage not in base or stage not in summary:
+                continue  # Baseline saved with other stages
+            for key in ("p50", "p95"):
+                old, new = base[stage][key], summary[stage][key]
+                if new - old > max(old * tolerance, NOISE_FLOOR_MS):
+                    failures.append(f"{name}/{stage} {key}: {old:.3f} -> {new:.3f} ms")
+        if summary["fps"] < base["fps"] * (1 - tolerance):
+            failures.append(f"{name} fps: {base['fps']:.1f} -> {summary['fps']:.1f}")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--source", default="synthetic", help="synthetic, a video file or an image directory")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--faces", type=int, default=1, help="Boxes used when the cascade finds no face")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--config", action="append", default=None,
+                        help=f"name:key=value,... with keys {', '.join(CONFIG_KEYS)} (repeatable)")
+    parser.add_argument("--skip-model", action="store_true", help="Constant predictions instead of the model")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--save-baseline", help="Store results as a baseline file")
+    parser.add_argument("--baseline", help="Compare against a stored baseline and fail on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown vs. baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    frames = load_frames(args.source, args.frames, args.width, args.height)
+    fallback_boxes = make_boxes(args.faces, args.width, args.height)
+    configs = [parse_config(spec) for spec in (args.config or ["default"])]
+    if args.source == "synthetic" and any(config["detect_interval"] != 1 for _, config in configs):
+        raise SystemExit("❌ detect_interval needs a recorded --source; synthetic frames have no faces to track")
+
+    print(f"\n📊 {len(frames)} frames from {args.source} at {args.width}x{args.height}, {args.faces} face(s)")
+    results = {}
+    for name, config in configs:
+        samples, fps = run_config(config, frames, fallback_boxes, skip_model=args.skip_model)
+        results[name] = summarize(samples, fps)
+        print_summary(name, config, results[name])
+
+    for path in filter(None, (args.json, args.save_baseline)):
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results written to {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = check_regressions(results, json.load(f), args.tolerance)
+        if failures:
+            print(f"\n❌ {len(failures)} regression(s) beyond {args.tolerance:.0%}:")
+            for failure in failures:
+                print(f"   {failure}")
+            sys.exit(1)
+        print(f"\n✅ No regressions beyond {args.tolerance:.0%}")
@@ -0,0 +1,88 @@
+"""
+Microbenchmark: per-frame preprocessing cost, legacy vs. FramePreprocessor
+
+Runs the original allocate-everything preprocessing (new CLAHE per frame,
+fresh gray/resized/float arrays, preds.copy() + Python weight loop) and
+the cached-buffer FramePreprocessor over the same synthetic frames, and
+prints the mean time per frame for each.
+
+    python benchmarks/preprocess_bench.py --frames 500 --faces 2
+"""
+import os
+import sys
+import time
+import argparse
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from emotion_pipeline import FramePreprocessor, EMOTIONS, CLASS_WEIGHTS
+from bench_utils import make_boxes
+
+
+def make_frames(count, width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(count)]
+
+
+def legacy_frame(frame, boxes, preds):
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    gray_enhanced = clahe.apply(gray)
+    gray_enhanced = cv2.convertScaleAbs(gray_enhanced, alpha=1.2, beta=10)
+
+    for (x, y, w, h) in boxes:
+        roi = gray_enhanced[y:y+h, x:x+w]
+        roi_resized = cv2.equalizeHist(cv2.resize(roi, (64, 64)))
+        roi_norm = roi_resized.astype("float32") / 255.0
+        np.expand_dims(roi_norm, axis=(0, -1))
+
+        preds_weighted = preds.copy()
+        for i, emotion in enumerate(EMOTIONS):
+            if emotion in CLASS_WEIGHTS:
+                preds_weighted[i] *= CLASS_WEIGHTS[emotion]
+        int(np.argmax(preds_weighted))
+
+
+def cached_frame(preprocessor, weight_vector, frame, boxes, preds_batch):
+    gray = preprocessor.preprocess(frame)
+    preprocessor.extract_faces(gray, boxes)
+    np.argmax(preds_batch * weight_vector, axis=1)
+
+
+def time_per_frame(fn, frames):
+    for frame in frames[:10]:
+        fn(frame)
+
+    start = time.perf_counter()
+    for frame in frames:
+        fn(frame)
+    return (time.perf_counter() - start) * 1000 / len(frames)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--faces", type=int, default=1)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    args = parser.parse_args()
+
+    frames = make_frames(args.frames, args.width, args.height)
+    boxes = make_boxes(args.faces, args.width, args.height)
+    preds = np.full(len(EMOTIONS), 1.0 / len(EMOTIONS), dtype=np.float32)
+    preds_batch = np.tile(preds, (len(boxes), 1))
+
+    preprocessor = FramePreprocessor(enhance_contrast=True, equalize_faces=True)
+    weight_vector = np.array([CLASS_WEIGHTS.get(e, 1.0) for e in EMOTIONS], dtype=np.float32)
+
+    legacy_ms = time_per_frame(lambda f: legacy_frame(f, boxes, preds), frames)
+    cached_ms = time_per_frame(lambda f: cached_frame(preprocessor, weight_vector, f, boxes, preds_batch), frames)
+
+    print(f"\n⏱️  Preprocessing {args.width}x{args.height}, {args.faces} face(s), {args.frames} frames")
+    print("=" * 50)
+    print(f"  legacy  {legacy_ms:8.3f} ms/frame")
+    print(f"  cached  {cached_ms:8.3f} ms/frame")
+    print(f"  saving  {legacy_ms - cached_ms:8.3f} ms/frame ({(1 - cached_ms / legacy_ms) * 100:.1f}%)")
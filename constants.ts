@@ -3,7 +3,7 @@ import type { Emotion } from './types';
 
 export const API_BASE_URL = 'http://localhost:5000/api';
 
-export const EMOTION_POLL_INTERVAL = 2000; // 2 seconds
+export const EMOTION_RECONNECT_DELAY = 2000; // 2 seconds, after the emotion stream drops
 
 type ColorDefinition = {
   gradient: string;
@@ -6,23 +6,14 @@ import warnings
 warnings.filterwarnings('ignore')
 
 import cv2
-import numpy as np
-from collections import deque, Counter
-import time
 
-try:
-    from tensorflow.keras.models import load_model
-except ImportError:
-    from keras.models import load_model
+from emotion_pipeline import EmotionPipeline
+from frame_source import LatestFrameReader, DEFAULT_SOURCE, open_source
+from inference_backends import DEFAULT_BACKEND
 
 # ==================== CONFIGURATION ====================
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-SRC_DIR = os.path.join(BASE_DIR, "src")
-MODEL_PATH = os.path.join(SRC_DIR, "model.h5")
-CASCADE_PATH = os.path.join(SRC_DIR, "haarcascade_frontalface_default.xml")
-
-# Mini-XCEPTION emotions (7 classes, FER2013 trained)
-EMOTIONS = ["Angry", "Disgust", "Fear", "Happy", "Sad", "Surprise", "Neutral"]
+INFERENCE_BACKEND = DEFAULT_BACKEND  # keras | direct | tflite | onnx (EMOTION_BACKEND env)
+FRAME_SOURCE = DEFAULT_SOURCE        # webcam | webcam:N | synthetic | image dir | video file (EMOTION_SOURCE env)
 
 # Accuracy improvement settings
 WINDOW_SIZE = 25
@@ -34,39 +25,35 @@ CLASS_WEIGHTS = {
     "Disgust": 1.2
 }
 
-# ==================== FUNCTIONS ====================
-def apply_clahe(gray_frame):
-    """Apply CLAHE to normalize lighting"""
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-    return clahe.apply(gray_frame)
+# Vote smoothing: majority | weighted | decay
+SMOOTHING = "majority"
+
+# Full Haar pass every N frames; faces are tracked in an ROI in between
+DETECT_INTERVAL = 5
 
 # ==================== LOAD MODEL ====================
-print("Loading Mini-XCEPTION model...")
+pipeline = EmotionPipeline(
+    window_size=WINDOW_SIZE,
+    conf_threshold=CONF_THRESHOLD,
+    class_weights=CLASS_WEIGHTS,
+    cooldown_seconds=COOLDOWN_SECONDS,
+    smoothing=SMOOTHING,
+    detect_interval=DETECT_INTERVAL,
+    backend=INFERENCE_BACKEND
+)
+
 try:
-    model = load_model(MODEL_PATH, compile=False)
-    print("✅ Mini-XCEPTION model loaded!")
-    print(f"   Model input shape: {model.input_shape}")
+    pipeline.warmup()
+    print(f"   Model input shape: {pipeline.model.input_shape}")
 except Exception as e:
     print(f"❌ Error loading model: {e}")
     exit(1)
 
-face_cascade = cv2.CascadeClassifier(CASCADE_PATH)
-if face_cascade.empty():
-    print("❌ Cascade file not found!")
-    exit(1)
-
-print("✅ Cascade loaded!")
-
 # ==================== SETUP ====================
-emotion_window = deque(maxlen=WINDOW_SIZE)
-current_emotion = "Neutral"
-last_change_time = 0.0
-
-cap = cv2.VideoCapture(0)
+cap = open_source(FRAME_SOURCE, realtime=True)
 if not cap.isOpened():
-    cap = cv2.VideoCapture(1)
-    if not cap.isOpened():
-        raise RuntimeError("Could not open webcam")
+    raise RuntimeError(f"Could not open frame source: {FRAME_SOURCE}")
+cap = LatestFrameReader(cap)  # Always process the newest frame
 
 print("\n🎭 Webcam started! Real-time emotion detection active.")
 print("=" * 50)
@@ -89,61 +76,18 @@ while True:
         break
     
     frame_count += 1
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    gray_enhanced = apply_clahe(gray)
+    faces = pipeline.process_frame(frame)
     
-    faces = face_cascade.detectMultiScale(
-        gray_enhanced, 
-        scaleFactor=1.1,
-        minNeighbors=4,
-        minSize=(30, 30)
-    )
-    
-    for (x, y, w, h) in faces:
-        # Extract and preprocess face
-        roi = gray_enhanced[y:y+h, x:x+w]
-        
-        # ⭐ FIX: Resize to 64x64 for Mini-XCEPTION
-        roi_resized = cv2.resize(roi, (64, 64))
-        roi_norm = roi_resized.astype("float32") / 255.0
-        roi_input = np.expand_dims(roi_norm, axis=(0, -1))
-        
-        # Predict emotion
-        preds = model.predict(roi_input, verbose=0)[0]
-        
-        # Apply class weights
-        preds_weighted = preds.copy()
-        for i, emotion in enumerate(EMOTIONS):
-            if emotion in CLASS_WEIGHTS:
-                preds_weighted[i] *= CLASS_WEIGHTS[emotion]
-        
-        # Get prediction
-        idx = int(np.argmax(preds_weighted))
-        label = EMOTIONS[idx]
-        conf = float(preds[idx])
-        
-        # Add to window if confident
-        if conf >= CONF_THRESHOLD:
-            emotion_window.append(label)
-        
-        # Stabilize with majority vote
-        if len(emotion_window) >= 8:
-            emotion_counts = Counter(emotion_window)
-            most_common = emotion_counts.most_common(1)[0][0]
-            
-            now = time.time()
-            if current_emotion != most_common:
-                if (now - last_change_time) >= COOLDOWN_SECONDS:
-                    current_emotion = most_common
-                    last_change_time = now
+    for face in faces:
+        x, y, w, h = face['box']
         
         # Draw results
         cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
         
-        cv2.putText(frame, f"{current_emotion}", (x, y-15),
+        cv2.putText(frame, f"{face['smoothed']}", (x, y-15),
                     cv2.FONT_HERSHEY_SIMPLEX, 1.1, (0, 255, 0), 2)
         
-        debug_text = f"{label} ({conf:.2f})"
+        debug_text = f"#{face['face_id']} {face['emotion']} ({face['confidence']:.2f})"
         cv2.putText(frame, debug_text, (x, y+h+25),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.6, (100, 100, 200), 1)
     
@@ -6,28 +6,21 @@ import warnings
 warnings.filterwarnings('ignore')
 
 import cv2
-import numpy as np
-from collections import deque, Counter
 import time
 import tkinter as tk
 from tkinter import ttk
 import threading
 from PIL import Image, ImageTk
 
-try:
-    from tensorflow.keras.models import load_model
-except ImportError:
-    from keras.models import load_model
-
+from emotion_pipeline import EmotionPipeline
+from frame_scheduler import InferenceScheduler, FramePacer
+from frame_source import LatestFrameReader, DEFAULT_SOURCE, open_source
+from inference_backends import DEFAULT_BACKEND
 from spotify_helper import SpotifyMoodRecommender
 
 # ==================== CONFIGURATION ====================
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-SRC_DIR = os.path.join(BASE_DIR, "src")
-MODEL_PATH = os.path.join(SRC_DIR, "model.h5")
-CASCADE_PATH = os.path.join(SRC_DIR, "haarcascade_frontalface_default.xml")
-
-EMOTIONS = ["Angry", "Disgust", "Fear", "Happy", "Sad", "Surprise", "Neutral"]
+INFERENCE_BACKEND = DEFAULT_BACKEND  # keras | direct | tflite | onnx (EMOTION_BACKEND env)
+FRAME_SOURCE = DEFAULT_SOURCE        # webcam | webcam:N | synthetic | image dir | video file (EMOTION_SOURCE env)
 
 # Emotion detection settings
 WINDOW_SIZE = 30
@@ -35,16 +28,15 @@ CONF_THRESHOLD = 0.40
 COOLDOWN_SECONDS = 10.0
 CLASS_WEIGHTS = {"Sad": 1.25, "Fear": 1.15, "Disgust": 1.2}
 
-# ==================== FUNCTIONS ====================
-def apply_clahe(gray_frame):
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-    return clahe.apply(gray_frame)
+# Vote smoothing: majority | weighted | decay
+SMOOTHING = "majority"
 
-# ==================== LOAD MODEL ====================
-print("Loading Mini-XCEPTION model...")
-model = load_model(MODEL_PATH, compile=False)
-face_cascade = cv2.CascadeClassifier(CASCADE_PATH)
-print("✅ Emotion model loaded!")
+# Full Haar pass every N frames; faces are tracked in an ROI in between
+DETECT_INTERVAL = 5
+
+# Display runs at DISPLAY_FPS, inference at most at INFERENCE_FPS
+DISPLAY_FPS = 30.0
+INFERENCE_FPS = 10.0
 
 # ==================== INITIALIZE SPOTIFY ====================
 print("Connecting to Spotify...")
@@ -65,19 +57,25 @@ class EmotionMusicApp:
         self.window.configure(bg='#1a1a1a')
         
         # State variables
-        self.emotion_window = deque(maxlen=WINDOW_SIZE)
+        self.pipeline = EmotionPipeline(
+            window_size=WINDOW_SIZE,
+            conf_threshold=CONF_THRESHOLD,
+            class_weights=CLASS_WEIGHTS,
+            cooldown_seconds=COOLDOWN_SECONDS,
+            smoothing=SMOOTHING,
+            detect_interval=DETECT_INTERVAL,
+            backend=INFERENCE_BACKEND
+        )
+        self.scheduler = InferenceScheduler(target_fps=INFERENCE_FPS)
         self.current_emotion = "Neutral"
-        self.last_emotion_change = 0.0
         self.running = True
         self.current_tracks = []
         
         # Create UI
         self.create_widgets()
         
-        # Start webcam
-        self.cap = cv2.VideoCapture(0)
-        if not self.cap.isOpened():
-            self.cap = cv2.VideoCapture(1)
+        # Start webcam (reader thread keeps only the newest frame)
+        self.cap = LatestFrameReader(open_source(FRAME_SOURCE, realtime=True, loop=True))
         
         # Start video thread
         self.video_thread = threading.Thread(target=self.update_video, daemon=True)
@@ -136,58 +134,35 @@ class EmotionMusicApp:
     
     def update_video(self):
         """Update video feed and detect emotions"""
+        self.pipeline.warmup()
+        pacer = FramePacer(DISPLAY_FPS)
+        faces = []
+        last_id = None
+        
         while self.running:
-            ok, frame = self.cap.read()
-            if not ok:
+            frame_id, frame, captured_at = self.cap.read_latest(last_id, timeout=5.0)
+            if frame is None or frame_id == last_id:
                 break
+            last_id = frame_id
             
             # Resize for display
             frame = cv2.resize(frame, (640, 480))
             
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            gray_enhanced = apply_clahe(gray)
+            started = time.perf_counter()
+            if self.scheduler.should_infer(started):
+                faces = self.pipeline.process_frame(frame)
+                self.scheduler.record(started, captured=captured_at)
             
-            faces = face_cascade.detectMultiScale(
-                gray_enhanced, 
-                scaleFactor=1.1,
-                minNeighbors=4,
-                minSize=(30, 30)
-            )
+            if self.pipeline.current_emotion != self.current_emotion:
+                self.current_emotion = self.pipeline.current_emotion
+                self.emotion_display.config(text=self.current_emotion)
             
-            for (x, y, w, h) in faces:
-                roi = gray_enhanced[y:y+h, x:x+w]
-                roi_resized = cv2.resize(roi, (64, 64))
-                roi_norm = roi_resized.astype("float32") / 255.0
-                roi_input = np.expand_dims(roi_norm, axis=(0, -1))
-                
-                preds = model.predict(roi_input, verbose=0)[0]
-                
-                preds_weighted = preds.copy()
-                for i, emotion in enumerate(EMOTIONS):
-                    if emotion in CLASS_WEIGHTS:
-                        preds_weighted[i] *= CLASS_WEIGHTS[emotion]
-                
-                idx = int(np.argmax(preds_weighted))
-                label = EMOTIONS[idx]
-                conf = float(preds[idx])
-                
-                if conf >= CONF_THRESHOLD:
-                    self.emotion_window.append(label)
-                
-                if len(self.emotion_window) >= 8:
-                    emotion_counts = Counter(self.emotion_window)
-                    most_common = emotion_counts.most_common(1)[0][0]
-                    
-                    now = time.time()
-                    if self.current_emotion != most_common:
-                        if (now - self.last_emotion_change) >= COOLDOWN_SECONDS:
-                            self.current_emotion = most_common
-                            self.last_emotion_change = now
-                            self.emotion_display.config(text=self.current_emotion)
+            for face in faces:
+                x, y, w, h = face['box']
                 
                 # Draw on frame
                 cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
-                cv2.putText(frame, f"{self.current_emotion} ({conf:.2f})", (x, y-10),
+                cv2.putText(frame, f"{face['smoothed']} ({face['confidence']:.2f})", (x, y-10),
                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
             
             # Convert to ImageTk
@@ -198,7 +173,7 @@ class EmotionMusicApp:
             self.video_label.imgtk = imgtk
             self.video_label.configure(image=imgtk)
             
-            time.sleep(0.03)  # ~30 FPS
+            pacer.wait()
     
     def fetch_music(self):
         """Fetch music for current emotion (button click handler)"""
@@ -0,0 +1,523 @@
+import os
+import time
+import threading
+
+import cv2
+import numpy as np
+
+from inference_backends import load_backend, DEFAULT_BACKEND
+from face_tracker import FaceTracker
+from emotion_smoothing import make_smoother
+from frame_source import open_source
+from metrics import STAGE_SECONDS
+
+# ==================== CONFIGURATION ====================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BASE_DIR, "src")
+MODEL_PATH = os.path.join(SRC_DIR, "model.h5")
+CASCADE_PATH = os.path.join(SRC_DIR, "haarcascade_frontalface_default.xml")
+
+# Mini-XCEPTION emotions (7 classes, FER2013 trained)
+EMOTIONS = ["Angry", "Disgust", "Fear", "Happy", "Sad", "Surprise", "Neutral"]
+
+# Server weights for difficult emotions, boosted for better detection;
+# batch analysis and the benchmarks use the same so results match
+CLASS_WEIGHTS = {"Sad": 1.5, "Fear": 1.4, "Disgust": 1.2}
+
+# Pipeline settings the web server runs with; server_pipeline() builds one
+# so replays of recorded footage match what the server would report
+SERVER_PIPELINE = {
+    "window_size": 30,
+    "conf_threshold": 0.40,
+    "class_weights": CLASS_WEIGHTS,
+    "emotion_thresholds": {"Sad": 0.30, "Fear": 0.30},  # Lower threshold for Sad and Fear
+    "enhance_contrast": True,
+    "equalize_faces": True,
+    "smoothing": "majority",  # majority | weighted | decay
+    "detect_interval": 5,     # Full Haar pass every N frames; ROI tracking in between
+}
+
+FACE_SIZE = (64, 64)
+INV_255 = np.float32(1.0 / 255.0)
+
+
+def _lap(timings, stage, started):
+    """Add the time since started to timings[stage] and return now; no-op without timings"""
+    if timings is None:
+        return started
+    now = time.perf_counter()
+    timings[stage] = timings.get(stage, 0.0) + now - started
+    return now
+
+
+class FramePreprocessor:
+    """
+    Allocation-free frame and face preprocessing
+
+    Keeps one CLAHE instance and reuses grayscale, face and batch buffers
+    between frames via OpenCV/NumPy dst/out arguments. Returned arrays are
+    views into these buffers and are overwritten by the next call, so a
+    preprocessor must not be shared between threads.
+    """
+
+    def __init__(self, enhance_contrast=False, equalize_faces=False, max_faces=4):
+        self.enhance_contrast = enhance_contrast
+        self.equalize_faces = equalize_faces
+        self.clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+
+        self._frame_shape = None
+        self.gray = None
+        self.enhanced = None
+        self.face = np.empty(FACE_SIZE[::-1], dtype=np.uint8)
+        self.batch = np.empty((max_faces,) + FACE_SIZE[::-1] + (1,), dtype=np.float32)
+
+    def preprocess(self, frame, timings=None):
+        """
+        BGR or grayscale frame -> lighting-normalized grayscale (reused buffer)
+
+        Args:
+            frame: BGR or grayscale image
+            timings: Optional dict; seconds per operation (cvt_color, clahe,
+                contrast) are added to it
+        """
+        shape = frame.shape[:2]
+        if shape != self._frame_shape:
+            self.gray = np.empty(shape, dtype=np.uint8)
+            self.enhanced = np.empty(shape, dtype=np.uint8)
+            self._frame_shape = shape
+
+        t = time.perf_counter() if timings is not None else 0.0
+        if frame.ndim == 2:
+            self.clahe.apply(frame, dst=self.enhanced)
+        else:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self.gray)
+            t = _lap(timings, "cvt_color", t)
+            self.clahe.apply(self.gray, dst=self.enhanced)
+        t = _lap(timings, "clahe", t)
+        if self.enhance_contrast:
+            cv2.convertScaleAbs(self.enhanced, dst=self.enhanced, alpha=1.2, beta=10)
+            _lap(timings, "contrast", t)
+        return self.enhanced
+
+    def extract_faces(self, gray, boxes, timings=None):
+        """
+        Crop, resize and normalize face ROIs into an (N, 64, 64, 1) batch view
+
+        Args:
+            gray: Preprocessed grayscale frame
+            boxes: (x, y, w, h) face boxes
+            timings: Optional dict; seconds per operation summed over faces
+                (resize, equalize, normalize) are added to it
+        """
+        n = len(boxes)
+        if n > self.batch.shape[0]:
+            self.batch = np.empty((n,) + self.batch.shape[1:], dtype=np.float32)
+
+        t = time.perf_counter() if timings is not None else 0.0
+        for i, (x, y, w, h) in enumerate(boxes):
+            cv2.resize(gray[y:y+h, x:x+w], FACE_SIZE, dst=self.face)
+            t = _lap(timings, "resize", t)
+            if self.equalize_faces:
+                cv2.equalizeHist(self.face, dst=self.face)
+                t = _lap(timings, "equalize", t)
+            np.multiply(self.face, INV_255, out=self.batch[i, :, :, 0], dtype=np.float32)
+            t = _lap(timings, "normalize", t)
+
+        return self.batch[:n]
+
+
+class FaceDetector:
+    """
+    Haar face detection with an optional detect-then-track mode
+
+    A full-frame cascade pass runs every detect_interval frames (or when a
+    face is lost). In between, each known face is searched for only inside
+    its previous box expanded by roi_margin, which is a small fraction of
+    the full 640x480 search. detect_scale < 1 runs full-frame passes on a
+    downscaled image.
+    """
+
+    def __init__(self, cascade, detect_interval=1, roi_margin=0.5, detect_scale=1.0,
+                 scale_factor=1.1, min_neighbors=4, min_size=(30, 30)):
+        self.cascade = cascade
+        self.detect_interval = max(1, detect_interval)
+        self.roi_margin = roi_margin
+        self.detect_scale = detect_scale
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+
+        self.last_boxes = []
+        self._frames_since_detect = 0
+
+    def _cascade(self, gray, min_size):
+        return self.cascade.detectMultiScale(
+            gray,
+            scaleFactor=self.scale_factor,
+            minNeighbors=self.min_neighbors,
+            minSize=min_size
+        )
+
+    def detect_full(self, gray):
+        """Full-frame cascade pass (optionally downscaled)"""
+        if self.detect_scale >= 1.0:
+            faces = self._cascade(gray, self.min_size)
+            return [tuple(int(v) for v in f) for f in faces]
+
+        small = cv2.resize(gray, None, fx=self.detect_scale, fy=self.detect_scale,
+                           interpolation=cv2.INTER_AREA)
+        min_size = tuple(max(1, int(v * self.detect_scale)) for v in self.min_size)
+        faces = self._cascade(small, min_size)
+        return [tuple(int(v / self.detect_scale) for v in f) for f in faces]
+
+    def track(self, gray, box):
+        """Search for a face only around its previous box; None if lost"""
+        x, y, w, h = box
+        frame_h, frame_w = gray.shape[:2]
+        mx, my = int(w * self.roi_margin), int(h * self.roi_margin)
+        x0, y0 = max(0, x - mx), max(0, y - my)
+        x1, y1 = min(frame_w, x + w + mx), min(frame_h, y + h + my)
+
+        min_size = (max(self.min_size[0], w // 2), max(self.min_size[1], h // 2))
+        faces = self._cascade(gray[y0:y1, x0:x1], min_size)
+        if len(faces) == 0:
+            return None
+
+        # Keep the candidate closest to the previous box centre
+        cx, cy = x + w / 2 - x0, y + h / 2 - y0
+        fx, fy, fw, fh = min(faces, key=lambda f: (f[0] + f[2] / 2 - cx) ** 2 + (f[1] + f[3] / 2 - cy) ** 2)
+        return (int(fx) + x0, int(fy) + y0, int(fw), int(fh))
+
+    def detect(self, gray):
+        """Face boxes for this frame, largest first"""
+        boxes = None
+        if self.last_boxes and self._frames_since_detect < self.detect_interval - 1:
+            boxes = []
+            for box in self.last_boxes:
+                tracked = self.track(gray, box)
+                if tracked is None:
+                    boxes = None  # Track lost, fall back to a full pass
+                    break
+                boxes.append(tracked)
+            self._frames_since_detect += 1
+
+        if boxes is None:
+            boxes = self.detect_full(gray)
+            self._frames_since_detect = 0
+
+        self.last_boxes = sorted(boxes, key=lambda f: f[2] * f[3], reverse=True)
+        return list(self.last_boxes)
+
+    def reset(self):
+        self.last_boxes = []
+        self._frames_since_detect = 0
+
+
+class EmotionPipeline:
+    """
+    Shared face detection + emotion classification pipeline
+
+    TensorFlow, the model and the Haar cascade are only loaded on first
+    use (or an explicit load()/warmup()), so importing this module - and
+    any server or test that imports it - stays fast.
+    """
+
+    def __init__(
+        self,
+        window_size=30,
+        conf_threshold=0.40,
+        class_weights=None,
+        emotion_thresholds=None,
+        cooldown_seconds=0.0,
+        min_votes=8,
+        smoothing="majority",
+        decay_alpha=0.15,
+        enhance_contrast=False,
+        equalize_faces=False,
+        detect_interval=1,
+        roi_margin=0.5,
+        detect_scale=1.0,
+        backend=None,
+        model_path=MODEL_PATH,
+        cascade_path=CASCADE_PATH,
+        stage_hook=None
+    ):
+        """
+        Args:
+            window_size: Majority-vote window per tracked face
+            conf_threshold: Minimum confidence for a prediction to vote
+            class_weights: {emotion: multiplier} applied before argmax
+            emotion_thresholds: Per-emotion overrides of conf_threshold
+            cooldown_seconds: Minimum time between smoothed emotion changes
+            min_votes: Votes needed before the smoothed emotion updates
+            smoothing: "majority" (label counts), "weighted" (confidence-
+                weighted probabilities) or "decay" (exponential decay)
+            decay_alpha: Per-frame weight of new votes for "decay"
+            enhance_contrast: Apply convertScaleAbs after CLAHE
+            equalize_faces: Histogram-equalize each face ROI
+            detect_interval: Full-frame Haar pass every N frames; in between
+                faces are tracked inside an expanded ROI (1 = every frame)
+            roi_margin: ROI expansion around the last box, as a fraction of its size
+            detect_scale: Downscale factor for full-frame passes
+            backend: Inference backend name (see inference_backends)
+            stage_hook: Optional callable(stage, seconds), called with every
+                stage timing that goes to STAGE_SECONDS and, per frame, with
+                the operations inside them (cvt_color, clahe, contrast,
+                resize, equalize, normalize, weighting, vote), e.g. for
+                benchmarks
+        """
+        self.window_size = window_size
+        self.conf_threshold = conf_threshold
+        self.class_weights = class_weights or {}
+        self.emotion_thresholds = emotion_thresholds or {}
+        self.cooldown_seconds = cooldown_seconds
+        self.min_votes = min_votes
+        self.smoothing = smoothing
+        self.decay_alpha = decay_alpha
+        self.enhance_contrast = enhance_contrast
+        self.equalize_faces = equalize_faces
+        self.detect_interval = detect_interval
+        self.roi_margin = roi_margin
+        self.detect_scale = detect_scale
+        self.backend_name = backend or DEFAULT_BACKEND
+        self.model_path = model_path
+        self.cascade_path = cascade_path
+        self.stage_hook = stage_hook
+
+        self.preprocessor = FramePreprocessor(enhance_contrast, equalize_faces)
+        self.weight_vector = np.array([self.class_weights.get(e, 1.0) for e in EMOTIONS], dtype=np.float32)
+
+        self.model = None
+        self.face_detector = None
+        make_smoother(smoothing, EMOTIONS)  # Validate the name up front
+        self.tracker = FaceTracker(smoother_factory=self.make_smoother)
+        self.current_emotion = "Neutral"
+        self._load_lock = threading.Lock()
+        self._predict_lock = threading.Lock()
+        self._local = threading.local()
+
+    # ==================== LOADING ====================
+    @property
+    def loaded(self):
+        return self.model is not None
+
+    def load(self):
+        """Load the cascade and inference backend (idempotent, thread-safe)"""
+        if self.loaded:
+            return self
+
+        with self._load_lock:
+            if self.loaded:
+                return self
+
+            face_cascade = cv2.CascadeClassifier(self.cascade_path)
+            if face_cascade.empty():
+                raise RuntimeError(f"Cascade file not found: {self.cascade_path}")
+
+            print(f"Loading Mini-XCEPTION model ({self.backend_name} backend)...")
+            self.face_detector = FaceDetector(
+                face_cascade,
+                detect_interval=self.detect_interval,
+                roi_margin=self.roi_margin,
+                detect_scale=self.detect_scale
+            )
+            self.model = load_backend(self.backend_name, self.model_path)
+            print("✅ Emotion model loaded!")
+
+        return self
+
+    def warmup(self, batch_sizes=(1,)):
+        """Load everything and run dummy passes so the first frame isn't slow"""
+        self.load()
+        for batch_size in batch_sizes:
+            self.model.predict(np.zeros((batch_size,) + FACE_SIZE + (1,), dtype=np.float32))
+        return self
+
+    # ==================== STAGES ====================
+    def _observe(self, stage, seconds):
+        STAGE_SECONDS.observe(seconds, stage)
+        if self.stage_hook is not None:
+            self.stage_hook(stage, seconds)
+
+    def _report(self, timings):
+        # Operation timings go to the hook only, not to STAGE_SECONDS
+        if timings:
+            for stage, seconds in timings.items():
+                self.stage_hook(stage, seconds)
+
+    def preprocess(self, frame, timings=None):
+        """BGR frame -> lighting-normalized grayscale"""
+        return self.preprocessor.preprocess(frame, timings)
+
+    def detect_faces(self, gray):
+        """Face boxes (detected or tracked), largest first"""
+        self.load()
+        return self.face_detector.detect(gray)
+
+    def extract_faces(self, gray, boxes, timings=None):
+        """Crop, resize and normalize face ROIs into an (N, 64, 64, 1) batch"""
+        return self.preprocessor.extract_faces(gray, boxes, timings)
+
+    def predict(self, roi_batch):
+        """Single forward pass over a batch of faces"""
+        self.load()
+        with self._predict_lock:
+            started = time.perf_counter()
+            preds = self.model.predict(roi_batch)
+            self._observe("predict", time.perf_counter() - started)
+            return preds
+
+    def crop_faces(self, image):
+        """
+        Stateless detection for one-off images (e.g. client uploads)
+
+        Unlike process_frame this keeps no tracking state and uses a
+        per-thread preprocessor and detector, so it is safe to call from
+        many request threads at once.
+
+        Returns:
+            (boxes, face_batch) where face_batch is an owned (N, 64, 64, 1) copy
+        """
+        self.load()
+        local = self._local
+        if not hasattr(local, "detector"):
+            local.preprocessor = FramePreprocessor(self.enhance_contrast, self.equalize_faces)
+            local.detector = FaceDetector(
+                cv2.CascadeClassifier(self.cascade_path),
+                detect_scale=self.detect_scale
+            )
+
+        gray = local.preprocessor.preprocess(image)
+        boxes = sorted(local.detector.detect_full(gray), key=lambda f: f[2] * f[3], reverse=True)
+        if not boxes:
+            return [], np.empty((0,) + FACE_SIZE[::-1] + (1,), dtype=np.float32)
+        return boxes, local.preprocessor.extract_faces(gray, boxes).copy()
+
+    def classify(self, preds_batch):
+        """
+        Apply class weights to an (N, 7) batch
+
+        Returns:
+            (indices, confidences, weighted probabilities)
+        """
+        weighted = preds_batch * self.weight_vector
+        idx = np.argmax(weighted, axis=1)
+        return idx, preds_batch[np.arange(len(idx)), idx], weighted
+
+    def accepts(self, label, confidence):
+        """Whether a prediction is confident enough to vote"""
+        return confidence >= self.emotion_thresholds.get(label, self.conf_threshold)
+
+    def make_smoother(self):
+        return make_smoother(self.smoothing, EMOTIONS, self.window_size, self.min_votes, self.decay_alpha)
+
+    def vote(self, face, label, confidence, probs, now):
+        """Feed a prediction to a face's smoother and update its smoothed emotion"""
+        if self.accepts(label, confidence):
+            face.smoother.update(label, probs, confidence)
+
+        most_common = face.smoother.result()
+        if not most_common or most_common == face.emotion:
+            return False
+        if face.last_change is not None and (now - face.last_change) < self.cooldown_seconds:
+            return False
+
+        face.emotion = most_common
+        face.last_change = now
+        return True
+
+    # ==================== FULL FRAME ====================
+    def process_frame(self, frame, now=None):
+        """
+        Detect and classify every face in a BGR frame
+
+        Returns:
+            List of per-face dicts (face_id, emotion, confidence, box,
+            smoothed, probs, weighted), largest face first
+        """
+        now = time.time() if now is None else now
+        # Operation-level timings only when someone is listening
+        timings = {} if self.stage_hook is not None else None
+
+        t0 = time.perf_counter()
+        gray = self.preprocess(frame, timings)
+        t1 = time.perf_counter()
+        boxes = self.detect_faces(gray)
+        t2 = time.perf_counter()
+        self._observe("preprocess", t1 - t0)
+        self._observe("detect", t2 - t1)
+        tracked = self.tracker.update(boxes)
+        if not boxes:
+            self._report(timings)
+            return []
+
+        faces = self.extract_faces(gray, boxes, timings)
+        self._observe("crop", time.perf_counter() - t2)
+        preds_batch = self.predict(faces)
+        t3 = time.perf_counter()
+        indices, confidences, weighted = self.classify(preds_batch)
+        t4 = _lap(timings, "weighting", t3)
+
+        results = []
+        for preds, face, idx, confidence, probs in zip(preds_batch, tracked, indices, confidences, weighted):
+            label = EMOTIONS[idx]
+            confidence = float(confidence)
+            self.vote(face, label, confidence, probs, now)
+
+            results.append({
+                'face_id': face.face_id,
+                'emotion': label,
+                'confidence': confidence,
+                'box': face.box,
+                'smoothed': face.emotion,
+                'probs': preds,
+                'weighted': probs
+            })
+
+        # Largest face drives the overall emotion
+        if tracked[0].smoother.result():
+            self.current_emotion = tracked[0].emotion
+
+        _lap(timings, "vote", t4)
+        self._observe("classify", time.perf_counter() - t3)
+        self._report(timings)
+        return results
+
+    def process_source(self, source, max_frames=None):
+        """
+        Run process_frame over every frame of a frame source
+
+        Offline sources are timed by their stream position, so cooldowns
+        behave as they would live even when replaying faster than realtime.
+
+        Args:
+            source: Frame source or open_source() spec
+            max_frames: Stop after this many frames
+
+        Yields:
+            (frame_index, frame, per-face results)
+        """
+        if isinstance(source, str):
+            source = open_source(source)
+
+        index = 0
+        while max_frames is None or index < max_frames:
+            ok, frame = source.read()
+            if not ok:
+                break
+            position = getattr(source, 'position', None)
+            yield index, frame, self.process_frame(frame, now=position)
+            index += 1
+
+
+def server_pipeline(**overrides):
+    """
+    EmotionPipeline with the web server's settings
+
+    Args:
+        **overrides: EmotionPipeline arguments replacing SERVER_PIPELINE values
+
+    Returns:
+        EmotionPipeline
+    """
+    return EmotionPipeline(**{**SERVER_PIPELINE, **overrides})
@@ -0,0 +1,141 @@
+from collections import deque
+
+
+class MajorityVote:
+    """
+    Sliding-window majority vote with O(1) updates
+
+    Keeps running per-label counts as labels enter and leave the window
+    instead of rebuilding a Counter every frame. The leader only changes
+    when another label strictly overtakes it, which avoids flicker on ties.
+    """
+
+    def __init__(self, window_size=30, min_votes=8):
+        self.window = deque()
+        self.window_size = window_size
+        self.min_votes = min_votes
+        self.counts = {}
+        self.leader = None
+
+    def __len__(self):
+        return len(self.window)
+
+    def update(self, label, probs=None, confidence=1.0):
+        if len(self.window) == self.window_size:
+            evicted = self.window.popleft()
+            self.counts[evicted] -= 1
+            if evicted == self.leader:
+                # Only the leader can lose its lead; rescan the few labels
+                self.leader = max(self.counts, key=self.counts.get)
+
+        self.window.append(label)
+        self.counts[label] = self.counts.get(label, 0) + 1
+        if self.leader is None or self.counts[label] > self.counts[self.leader]:
+            self.leader = label
+
+    def result(self):
+        """Winning label, or None until min_votes have been collected"""
+        if len(self.window) < self.min_votes:
+            return None
+        return self.leader
+
+    def reset(self):
+        self.window.clear()
+        self.counts.clear()
+        self.leader = None
+
+
+class WeightedVote:
+    """
+    Sliding-window vote over probability vectors weighted by confidence
+
+    Maintains a running sum of confidence * probs, so a few confident
+    frames outweigh many borderline ones and updates stay O(classes).
+    """
+
+    def __init__(self, labels, window_size=30, min_votes=8):
+        self.labels = list(labels)
+        self.window = deque()
+        self.window_size = window_size
+        self.min_votes = min_votes
+        self.totals = [0.0] * len(self.labels)
+
+    def __len__(self):
+        return len(self.window)
+
+    def update(self, label, probs, confidence=1.0):
+        if len(self.window) == self.window_size:
+            old = self.window.popleft()
+            for i, v in enumerate(old):
+                self.totals[i] -= v
+
+        weighted = [float(p) * confidence for p in probs]
+        self.window.append(weighted)
+        for i, v in enumerate(weighted):
+            self.totals[i] += v
+
+    def scores(self):
+        total = sum(self.totals) or 1.0
+        return {label: v / total for label, v in zip(self.labels, self.totals)}
+
+    def result(self):
+        if len(self.window) < self.min_votes:
+            return None
+        return self.labels[max(range(len(self.totals)), key=self.totals.__getitem__)]
+
+    def reset(self):
+        self.window.clear()
+        self.totals = [0.0] * len(self.labels)
+
+
+class DecayedVote:
+    """
+    Exponentially-decayed vote over probability vectors
+
+    state = (1 - alpha) * state + alpha * confidence * probs. No window to
+    store; recent frames dominate, so changes are picked up faster than
+    with a fixed-size majority window while single outliers still fade.
+    """
+
+    def __init__(self, labels, alpha=0.15, min_votes=8):
+        self.labels = list(labels)
+        self.alpha = alpha
+        self.min_votes = min_votes
+        self.state = [0.0] * len(self.labels)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def update(self, label, probs, confidence=1.0):
+        keep = 1.0 - self.alpha
+        gain = self.alpha * confidence
+        self.state = [keep * s + gain * float(p) for s, p in zip(self.state, probs)]
+        self.count += 1
+
+    def scores(self):
+        total = sum(self.state) or 1.0
+        return {label: v / total for label, v in zip(self.labels, self.state)}
+
+    def result(self):
+        if self.count < self.min_votes:
+            return None
+        return self.labels[max(range(len(self.state)), key=self.state.__getitem__)]
+
+    def reset(self):
+        self.state = [0.0] * len(self.labels)
+        self.count = 0
+
+
+SMOOTHERS = ("majority", "weighted", "decay")
+
+
+def make_smoother(kind, labels, window_size=30, min_votes=8, alpha=0.15):
+    """Build a smoother by name: majority | weighted | decay"""
+    if kind == "majority":
+        return MajorityVote(window_size, min_votes)
+    if kind == "weighted":
+        return WeightedVote(labels, window_size, min_votes)
+    if kind == "decay":
+        return DecayedVote(labels, alpha, min_votes)
+    raise ValueError(f"Unknown smoothing '{kind}' (choose from {', '.join(SMOOTHERS)})")
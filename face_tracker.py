@@ -0,0 +1,99 @@
+from emotion_smoothing import MajorityVote
+
+
+def box_iou(a, b):
+    """Intersection-over-union of two (x, y, w, h) boxes"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    if inter == 0:
+        return 0.0
+
+    return inter / float(aw * ah + bw * bh - inter)
+
+
+class TrackedFace:
+    """A face followed across frames with its own emotion smoother"""
+
+    def __init__(self, face_id, box, smoother):
+        self.face_id = face_id
+        self.box = box
+        self.smoother = smoother
+        self.missed = 0
+        self.emotion = "Neutral"
+        self.last_change = None
+
+
+class FaceTracker:
+    """
+    Assign stable ids to detected faces between frames
+
+    Boxes are greedily matched to existing tracks by IoU. Unmatched boxes
+    start new tracks; tracks unseen for more than max_missed frames are
+    dropped so their smoothing state doesn't leak into new faces.
+    """
+
+    def __init__(self, window_size=30, iou_threshold=0.3, max_missed=15, smoother_factory=None):
+        """
+        Args:
+            window_size: Vote window for the default MajorityVote smoother
+            smoother_factory: Callable returning a fresh smoother per face
+        """
+        self.smoother_factory = smoother_factory or (lambda: MajorityVote(window_size))
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.tracks = {}
+        self._next_id = 0
+
+    def update(self, boxes):
+        """
+        Match this frame's face boxes to tracks
+
+        Args:
+            boxes: Iterable of (x, y, w, h) face boxes
+
+        Returns:
+            List of TrackedFace, one per input box in the same order
+        """
+        boxes = [tuple(int(v) for v in box) for box in boxes]
+
+        pairs = []
+        for i, box in enumerate(boxes):
+            for face_id, track in self.tracks.items():
+                iou = box_iou(box, track.box)
+                if iou >= self.iou_threshold:
+                    pairs.append((iou, i, face_id))
+        pairs.sort(reverse=True)
+
+        assigned = [None] * len(boxes)
+        used_ids = set()
+        for _, i, face_id in pairs:
+            if assigned[i] is not None or face_id in used_ids:
+                continue
+            assigned[i] = self.tracks[face_id]
+            used_ids.add(face_id)
+
+        for i, box in enumerate(boxes):
+            track = assigned[i]
+            if track is None:
+                track = TrackedFace(self._next_id, box, self.smoother_factory())
+                self.tracks[track.face_id] = track
+                self._next_id += 1
+                used_ids.add(track.face_id)
+                assigned[i] = track
+            track.box = box
+            track.missed = 0
+
+        for face_id in list(self.tracks):
+            if face_id not in used_ids:
+                self.tracks[face_id].missed += 1
+                if self.tracks[face_id].missed > self.max_missed:
+                    del self.tracks[face_id]
+
+        return assigned
+
+    def reset(self):
+        self.tracks.clear()
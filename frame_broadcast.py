@@ -0,0 +1,137 @@
+import time
+import threading
+
+import cv2
+
+from frame_scheduler import FramePacer
+from metrics import STAGE_SECONDS
+
+
+class MjpegBroadcaster:
+    """
+    Encode each frame to JPEG once and share the bytes with every viewer
+
+    A single thread pulls frames from the capture worker (at most max_fps,
+    and only while someone is watching), encodes them and publishes the
+    bytes. Viewers always get the newest JPEG; a client that can't keep up
+    simply skips frames instead of queueing them, so encode CPU and
+    per-client bandwidth stay flat as viewers are added.
+    """
+
+    def __init__(self, wait_for_frame, quality=80, size=None, max_fps=15.0):
+        """
+        Args:
+            wait_for_frame: Callable(last_id, timeout) -> (frame_id, frame, ...)
+                            blocking until a newer frame is available
+            quality: JPEG quality (0-100)
+            size: Optional (width, height) to resize streamed frames to
+            max_fps: Upper bound on encoded frames per second
+        """
+        self.wait_for_frame = wait_for_frame
+        self.quality = quality
+        self.size = size
+        self.max_fps = max_fps
+        self._params = [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)]
+
+        self._cond = threading.Condition()
+        self.jpeg = None
+        self.jpeg_id = 0
+        self.source_id = -1
+        self.subscribers = 0
+        self.encoded = 0
+        self._running = True
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def encode(self, frame):
+        """JPEG bytes for one frame at the configured size and quality"""
+        started = time.perf_counter()
+        if self.size and (frame.shape[1], frame.shape[0]) != tuple(self.size):
+            frame = cv2.resize(frame, tuple(self.size), interpolation=cv2.INTER_AREA)
+        ok, buffer = cv2.imencode('.jpg', frame, self._params)
+        if not ok:
+            return None
+        with self._cond:
+            self.encoded += 1
+        STAGE_SECONDS.observe(time.perf_counter() - started, "encode")
+        return buffer.tobytes()
+
+    def _publish(self, frame_id, data):
+        with self._cond:
+            if frame_id == self.source_id:
+                return
+            self.jpeg = data
+            self.jpeg_id += 1
+            self.source_id = frame_id
+            self._cond.notify_all()
+
+    def _run(self):
+        pacer = FramePacer(self.max_fps)
+        while self._running:
+            with self._cond:
+                # Nobody watching: don't spend CPU encoding
+                self._cond.wait_for(lambda: self.subscribers > 0 or not self._running)
+                if not self._running:
+                    return
+                last_id = self.source_id
+
+            frame_id, frame = self.wait_for_frame(last_id, timeout=1.0)[:2]
+            if frame is None:
+                # Camera starting or missing: block on the source's own id
+                # instead of spinning until its first frame arrives
+                self.wait_for_frame(frame_id, timeout=1.0)
+                continue
+            if frame_id == last_id:
+                continue
+
+            data = self.encode(frame)
+            if data is not None:
+                self._publish(frame_id, data)
+            pacer.wait()
+
+    def snapshot(self, frame_id, frame):
+        """Encoded bytes for this frame, reusing the stream's JPEG when it matches"""
+        with self._cond:
+            if frame_id == self.source_id and self.jpeg is not None:
+                return self.jpeg
+        data = self.encode(frame)
+        if data is not None:
+            self._publish(frame_id, data)
+        return data
+
+    def frames(self):
+        """Generator of JPEG bytes for one viewer, newest frame each time"""
+        with self._cond:
+            self.subscribers += 1
+            self._cond.notify_all()
+        try:
+            last_id = None
+            while self._running:
+                with self._cond:
+                    self._cond.wait_for(
+                        lambda: (self.jpeg is not None and self.jpeg_id != last_id) or not self._running,
+                        timeout=1.0
+                    )
+                    if self.jpeg_id == last_id or self.jpeg is None:
+                        continue
+                    last_id, data = self.jpeg_id, self.jpeg
+                yield data
+        finally:
+            with self._cond:
+                self.subscribers -= 1
+
+    def stats(self):
+        with self._cond:
+            return {
+                'viewers': self.subscribers,
+                'encoded_frames': self.encoded,
+                'quality': self.quality,
+                'max_fps': self.max_fps
+            }
+
+    def close(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._thread.join(timeout=2.0)
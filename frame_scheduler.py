@@ -0,0 +1,101 @@
+import time
+
+
+class InferenceScheduler:
+    """
+    Decouple inference rate from capture/display rate
+
+    Every captured frame is still shown, but only frames that are "due"
+    get inference. The interval between inferences is the larger of
+    1/target_fps and the measured inference cost divided by cpu_budget,
+    so when inference gets slower than the budget allows, more frames
+    are dropped instead of the video falling behind.
+    """
+
+    def __init__(self, target_fps=10.0, cpu_budget=0.6, smoothing=0.2):
+        """
+        Args:
+            target_fps: Desired inferences per second
+            cpu_budget: Max fraction of wall time spent in inference
+            smoothing: EMA factor for the measured inference cost
+        """
+        self.target_fps = target_fps
+        self.cpu_budget = cpu_budget
+        self.smoothing = smoothing
+
+        self.cost = 0.0
+        self.latency = 0.0
+        self.inferred = 0
+        self.skipped = 0
+        self._next_due = 0.0
+        self._last_infer = None
+        self._fps = 0.0
+
+    @property
+    def interval(self):
+        """Current minimum time between inferences (seconds)"""
+        return max(1.0 / self.target_fps, self.cost / self.cpu_budget)
+
+    @property
+    def fps(self):
+        """Measured inferences per second (EMA)"""
+        return self._fps
+
+    def should_infer(self, now=None):
+        now = time.perf_counter() if now is None else now
+        if now >= self._next_due:
+            return True
+        self.skipped += 1
+        return False
+
+    def record(self, started, finished=None, captured=None):
+        """
+        Report one inference that ran from started to finished (perf_counter)
+
+        Args:
+            captured: When the frame was captured, to track capture-to-result latency
+        """
+        finished = time.perf_counter() if finished is None else finished
+        cost = finished - started
+
+        if captured is not None:
+            latency = finished - captured
+            self.latency = latency if self.latency == 0.0 else (1 - self.smoothing) * self.latency + self.smoothing * latency
+
+        self.cost = cost if self.inferred == 0 else (1 - self.smoothing) * self.cost + self.smoothing * cost
+        if self._last_infer is not None and started > self._last_infer:
+            rate = 1.0 / (started - self._last_infer)
+            self._fps = rate if self._fps == 0.0 else (1 - self.smoothing) * self._fps + self.smoothing * rate
+
+        self.inferred += 1
+        self._last_infer = started
+        self._next_due = started + self.interval
+
+    def stats(self):
+        return {
+            'target_fps': self.target_fps,
+            'inference_fps': round(self._fps, 2),
+            'inference_ms': round(self.cost * 1000, 2),
+            'capture_latency_ms': round(self.latency * 1000, 2),
+            'inferred_frames': self.inferred,
+            'skipped_frames': self.skipped
+        }
+
+
+class FramePacer:
+    """Sleep only for what's left of the frame budget instead of a fixed delay"""
+
+    def __init__(self, fps=30.0):
+        self.frame_time = 1.0 / fps
+        self._deadline = None
+
+    def wait(self):
+        now = time.perf_counter()
+        if self._deadline is None or now - self._deadline > self.frame_time:
+            # First frame, or we fell far behind: don't try to catch up
+            self._deadline = now
+        self._deadline += self.frame_time
+
+        remaining = self._deadline - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
@@ -0,0 +1,298 @@
+import os
+import time
+import argparse
+import threading
+
+import cv2
+import numpy as np
+
+from frame_scheduler import FramePacer
+from metrics import STAGE_SECONDS
+
+# Any object with cv2.VideoCapture's isOpened() / read() / release() is a
+# frame source. Offline sources (files, folders, synthetic) also expose
+# `position`: the stream time in seconds of the last frame read, so replays
+# are timed by the recording rather than by how fast they are processed.
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+# Source used by the live apps: webcam | webcam:N | synthetic | <dir> | <video>
+DEFAULT_SOURCE = os.getenv("EMOTION_SOURCE", "webcam")
+
+
+def open_webcam(index=None):
+    """Open a webcam by index, or the default one falling back to the second device"""
+    if index is not None:
+        return cv2.VideoCapture(index)
+    cap = cv2.VideoCapture(0)
+    if not cap.isOpened():
+        cap = cv2.VideoCapture(1)
+    return cap
+
+
+class LatestFrameReader:
+    """
+    Read a capture on its own thread and keep only the newest frame
+
+    cv2.VideoCapture.read() hands out the oldest buffered frame, so a
+    consumer slower than the camera falls further and further behind. This
+    reader drains the capture continuously and overwrites a single slot;
+    consumers always get the most recent frame plus the perf_counter time
+    it was captured, and frames nobody picked up are counted as dropped.
+    """
+
+    def __init__(self, capture):
+        self.cap = capture
+        self._cond = threading.Condition()
+        self.frame = None
+        self.frame_id = 0
+        self.timestamp = 0.0
+        self.captured = 0
+        self.dropped = 0
+        self._consumed_id = 0
+        self.running = True
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def _run(self):
+        while self.running:
+            started = time.perf_counter()
+            ok, frame = self.cap.read()
+            if not ok:
+                time.sleep(0.1)
+                continue
+            captured_at = time.perf_counter()
+            STAGE_SECONDS.observe(captured_at - started, "capture")
+
+            with self._cond:
+                if self.frame_id > self._consumed_id:
+                    self.dropped += 1
+                self.frame = frame
+                self.frame_id += 1
+                self.timestamp = captured_at
+                self.captured += 1
+                self._cond.notify_all()
+
+    def read_latest(self, last_id=None, timeout=1.0):
+        """
+        Newest frame, waiting up to timeout for one newer than last_id
+
+        Returns:
+            (frame_id, frame, captured_at); frame is None before the first
+            frame arrives, frame_id == last_id if nothing new came in time
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self.frame_id != last_id and self.frame is not None, timeout=timeout)
+            self._consumed_id = max(self._consumed_id, self.frame_id)
+            return self.frame_id, self.frame, self.timestamp
+
+    def read(self, timeout=5.0):
+        """cv2.VideoCapture-style (ok, frame) returning only unseen frames"""
+        with self._cond:
+            last_id = self._consumed_id
+        frame_id, frame, _ = self.read_latest(last_id, timeout)
+        if frame is None or frame_id == last_id:
+            return False, None
+        return True, frame
+
+    def stats(self):
+        with self._cond:
+            return {
+                'captured_frames': self.captured,
+                'dropped_frames': self.dropped
+            }
+
+    def release(self):
+        self.running = False
+        self.thread.join(timeout=2.0)
+        self.cap.release()
+
+
+class VideoFileSource:
+    """
+    Frames from a video file, as fast as they decode
+
+    With realtime=True reads are paced to the file's frame rate (so it can
+    stand in for a camera); loop=True rewinds at the end instead of ending.
+    """
+
+    def __init__(self, path, realtime=False, loop=False):
+        self.path = path
+        self.loop = loop
+        self.cap = cv2.VideoCapture(path)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self._pacer = FramePacer(self.fps) if realtime else None
+        self.position = 0.0
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        ok, frame = self.cap.read()
+        if not ok and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.cap.read()
+        if not ok:
+            return False, None
+        self.position = self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        if self._pacer:
+            self._pacer.wait()
+        return True, frame
+
+    def release(self):
+        self.cap.release()
+
+
+class ImageDirSource:
+    """Frames from the images in a directory, in filename order"""
+
+    def __init__(self, path, fps=30.0, realtime=False, loop=False):
+        """
+        Args:
+            fps: Nominal frame rate, used for position and realtime pacing
+        """
+        self.path = path
+        self.fps = fps
+        self.loop = loop
+        self.files = sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        self._pacer = FramePacer(fps) if realtime else None
+        self.index = 0
+        self.position = 0.0
+
+    def isOpened(self):
+        return bool(self.files)
+
+    def read(self):
+        while True:
+            if self.index >= len(self.files):
+                if not self.loop or not self.files:
+                    return False, None
+                self.index = 0
+            path = self.files[self.index]
+            self.position = self.index / self.fps
+            self.index += 1
+
+            frame = cv2.imread(path)
+            if frame is not None:
+                break
+            print(f"⚠️ Skipping unreadable image: {path}")
+
+        if self._pacer:
+            self._pacer.wait()
+        return True, frame
+
+    def release(self):
+        self.index = len(self.files)
+
+
+class SyntheticCapture:
+    """
+    Camera stand-in producing generated BGR frames
+
+    A bright block drifts across a gradient so consecutive frames differ.
+    read() is paced to fps like a real device unless realtime=False; with
+    max_frames set the stream ends after that many frames. Useful for
+    latency tests and benchmarks without a webcam.
+    """
+
+    def __init__(self, width=640, height=480, fps=30.0, realtime=True, max_frames=None):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.max_frames = max_frames
+        self._pacer = FramePacer(fps) if realtime else None
+        self.position = 0.0
+        self._background = np.repeat(
+            np.linspace(40, 200, width, dtype=np.uint8)[None, :, None], height, axis=0
+        ).repeat(3, axis=2)
+        self.count = 0
+        self._open = True
+
+    def isOpened(self):
+        return self._open
+
+    def read(self):
+        if not self._open or (self.max_frames is not None and self.count >= self.max_frames):
+            return False, None
+        if self._pacer:
+            self._pacer.wait()
+
+        frame = self._background.copy()
+        size = min(self.width, self.height) // 3
+        x = (self.count * 4) % max(1, self.width - size)
+        y = (self.height - size) // 2
+        frame[y:y + size, x:x + size] = 230
+        cv2.putText(frame, str(self.count), (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+        self.position = self.count / self.fps
+        self.count += 1
+        return True, frame
+
+    def release(self):
+        self._open = False
+
+
+def open_source(spec="webcam", realtime=False, loop=False):
+    """
+    Open a frame source from a short description
+
+    Args:
+        spec: "webcam" (default camera), "webcam:N" or "N" (camera index),
+              "synthetic", a directory of images, or a video file path
+        realtime: Pace offline sources to their frame rate instead of
+                  reading as fast as possible
+        loop: Restart offline sources at the end
+
+    Returns:
+        Frame source (cv2.VideoCapture-compatible)
+    """
+    spec = str(spec or "webcam")
+    if spec == "webcam":
+        return open_webcam()
+    if spec.startswith("webcam:") or spec.isdigit():
+        return open_webcam(int(spec.split(":")[-1]))
+    if spec == "synthetic":
+        return SyntheticCapture(realtime=realtime)
+    if os.path.isdir(spec):
+        return ImageDirSource(spec, realtime=realtime, loop=loop)
+    if os.path.isfile(spec):
+        return VideoFileSource(spec, realtime=realtime, loop=loop)
+    raise ValueError(f"Unknown frame source '{spec}' (webcam, webcam:N, synthetic, a directory or a video file)")
+
+
+if __name__ == "__main__":
+    # Replay a source through the full pipeline as fast as possible
+    from emotion_pipeline import server_pipeline
+
+    parser = argparse.ArgumentParser(description="Replay a frame source through EmotionPipeline")
+    parser.add_argument("source", help="webcam, webcam:N, synthetic, image directory or video file")
+    parser.add_argument("--max-frames", type=int, default=None)
+    parser.add_argument("--backend", default=None, help="Inference backend (default EMOTION_BACKEND env)")
+    args = parser.parse_args()
+
+    pipeline = server_pipeline(backend=args.backend)
+    pipeline.warmup()
+    source = open_source(args.source)
+    if not source.isOpened():
+        raise SystemExit(f"❌ Could not open source: {args.source}")
+
+    counts = {}
+    frames = faces = 0
+    started = time.perf_counter()
+    for _, _, results in pipeline.process_source(source, max_frames=args.max_frames):
+        frames += 1
+        faces += len(results)
+        if results:
+            counts[results[0]['smoothed']] = counts.get(results[0]['smoothed'], 0) + 1
+    elapsed = time.perf_counter() - started
+    source.release()
+
+    print(f"✅ {frames} frames, {faces} faces in {elapsed:.2f}s ({frames / max(elapsed, 1e-9):.1f} frames/s)")
+    for emotion, count in sorted(counts.items(), key=lambda kv: -kv[1]):
+        print(f"   {emotion:<10} {count}")
@@ -0,0 +1,240 @@
+"""
+Pluggable inference backends for the Mini-XCEPTION emotion model
+
+Every backend takes a float32 batch shaped (N, 64, 64, 1) and returns an
+(N, 7) probability array, so the detection loops don't care which engine
+runs underneath. Pick one with the EMOTION_BACKEND environment variable:
+
+    keras   - model.predict (original behaviour, highest per-call overhead)
+    direct  - compiled tf.function calling model(x, training=False)
+    tflite  - TensorFlow Lite interpreter on a converted model.tflite
+    onnx    - onnxruntime on CPU with a converted model.onnx
+
+Run `python inference_backends.py --benchmark` to measure them on this host.
+"""
+import os
+import time
+import argparse
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "src", "model.h5")
+
+DEFAULT_BACKEND = os.getenv("EMOTION_BACKEND", "direct")
+INPUT_SHAPE = (64, 64, 1)
+
+
+def _load_keras_model(model_path):
+    try:
+        from tensorflow.keras.models import load_model
+    except ImportError:
+        from keras.models import load_model
+    return load_model(model_path, compile=False)
+
+
+def _exported_path(model_path, fmt):
+    return os.path.splitext(model_path)[0] + "." + fmt
+
+
+# ==================== BACKENDS ====================
+class KerasPredictBackend:
+    """Plain model.predict - kept for comparison and as the safe fallback"""
+
+    name = "keras"
+
+    def __init__(self, model_path):
+        self.model = _load_keras_model(model_path)
+        self.input_shape = self.model.input_shape
+
+    def predict(self, batch):
+        return self.model.predict(batch, verbose=0)
+
+
+class DirectCallBackend:
+    """Call the Keras model directly inside a compiled tf.function"""
+
+    name = "direct"
+
+    def __init__(self, model_path):
+        import tensorflow as tf
+
+        self.model = _load_keras_model(model_path)
+        self.input_shape = self.model.input_shape
+
+        # Fixed signature with a dynamic batch dim so we never retrace
+        self._forward = tf.function(
+            lambda x: self.model(x, training=False),
+            input_signature=[tf.TensorSpec((None,) + INPUT_SHAPE, tf.float32)]
+        )
+
+    def predict(self, batch):
+        return self._forward(batch).numpy()
+
+
+class TFLiteBackend:
+    """TensorFlow Lite interpreter, converted from model.h5 on first use"""
+
+    name = "tflite"
+
+    def __init__(self, model_path, num_threads=None):
+        tflite_path = _exported_path(model_path, "tflite")
+        if not os.path.exists(tflite_path):
+            export_model(model_path, "tflite", tflite_path)
+
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        self.interpreter = Interpreter(model_path=tflite_path, num_threads=num_threads or os.cpu_count())
+        self._input = self.interpreter.get_input_details()[0]["index"]
+        self._output = self.interpreter.get_output_details()[0]["index"]
+        self._batch_size = None
+        self.input_shape = (None,) + INPUT_SHAPE
+
+    def predict(self, batch):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        if batch.shape[0] != self._batch_size:
+            self.interpreter.resize_tensor_input(self._input, batch.shape)
+            self.interpreter.allocate_tensors()
+            self._batch_size = batch.shape[0]
+
+        self.interpreter.set_tensor(self._input, batch)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self._output)
+
+
+class OnnxBackend:
+    """onnxruntime on CPU, converted from model.h5 on first use"""
+
+    name = "onnx"
+
+    def __init__(self, model_path):
+        onnx_path = _exported_path(model_path, "onnx")
+        if not os.path.exists(onnx_path):
+            export_model(model_path, "onnx", onnx_path)
+
+        import onnxruntime as ort
+
+        self.session = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+        self._input = self.session.get_inputs()[0].name
+        self.input_shape = (None,) + INPUT_SHAPE
+
+    def predict(self, batch):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        return self.session.run(None, {self._input: batch})[0]
+
+
+BACKENDS = {
+    KerasPredictBackend.name: KerasPredictBackend,
+    DirectCallBackend.name: DirectCallBackend,
+    TFLiteBackend.name: TFLiteBackend,
+    OnnxBackend.name: OnnxBackend
+}
+
+
+def load_backend(name=None, model_path=MODEL_PATH):
+    """
+    Create an inference backend by name
+
+    Args:
+        name: One of BACKENDS (defaults to EMOTION_BACKEND / "direct")
+        model_path: Path to the Keras model.h5
+
+    Returns:
+        Backend instance exposing predict(batch) and input_shape
+    """
+    name = (name or DEFAULT_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}' (choose from {', '.join(BACKENDS)})")
+
+    return BACKENDS[name](model_path)
+
+
+# ==================== EXPORT ====================
+def export_model(model_path, fmt, output_path=None):
+    """
+    Convert model.h5 to an exported format
+
+    Args:
+        model_path: Path to the Keras model.h5
+        fmt: "tflite" or "onnx"
+        output_path: Destination file (defaults next to model.h5)
+
+    Returns:
+        Path of the written file
+    """
+    output_path = output_path or _exported_path(model_path, fmt)
+    model = _load_keras_model(model_path)
+
+    if fmt == "tflite":
+        import tensorflow as tf
+
+        converter = tf.lite.TFLiteConverter.from_keras_model(model)
+        with open(output_path, "wb") as f:
+            f.write(converter.convert())
+    elif fmt == "onnx":
+        import tensorflow as tf
+        import tf2onnx
+
+        spec = (tf.TensorSpec((None,) + INPUT_SHAPE, tf.float32, name="input"),)
+        tf2onnx.convert.from_keras(model, input_signature=spec, output_path=output_path)
+    else:
+        raise ValueError(f"Unknown export format '{fmt}'")
+
+    print(f"✅ Exported {fmt} model to {output_path}")
+    return output_path
+
+
+# ==================== BENCHMARK ====================
+def benchmark_backends(names=None, model_path=MODEL_PATH, batch_sizes=(1, 4), runs=200):
+    """
+    Measure per-call latency of each backend on random input
+
+    Returns:
+        Dict of {(backend, batch_size): mean milliseconds per call}
+    """
+    results = {}
+    rng = np.random.default_rng(0)
+
+    for name in names or BACKENDS:
+        try:
+            backend = load_backend(name, model_path)
+        except Exception as e:
+            print(f"❌ {name}: unavailable ({e})")
+            continue
+
+        for batch_size in batch_sizes:
+            batch = rng.random((batch_size,) + INPUT_SHAPE, dtype=np.float32)
+
+            # Warm-up (graph tracing, tensor allocation)
+            for _ in range(5):
+                backend.predict(batch)
+
+            start = time.perf_counter()
+            for _ in range(runs):
+                backend.predict(batch)
+            elapsed_ms = (time.perf_counter() - start) * 1000 / runs
+
+            results[(name, batch_size)] = elapsed_ms
+            print(f"  {name:<7} batch={batch_size:<3} {elapsed_ms:8.2f} ms/call")
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export or benchmark emotion model backends")
+    parser.add_argument("--export", choices=["tflite", "onnx"], help="Convert model.h5 to this format")
+    parser.add_argument("--benchmark", action="store_true", help="Time every available backend")
+    parser.add_argument("--model", default=MODEL_PATH, help="Path to model.h5")
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.export:
+        export_model(args.model, args.export)
+    if args.benchmark or not args.export:
+        print("\n⏱️  Inference backend latency")
+        print("=" * 50)
+        benchmark_backends(model_path=args.model, runs=args.runs)
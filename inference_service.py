@@ -0,0 +1,456 @@
+"""
+Inference service: one process owns the camera and the model
+
+    export EMOTION_SERVICE_KEY=$(python -c "import secrets; print(secrets.token_hex(16))")
+    python inference_service.py
+    EMOTION_INFERENCE_SERVICE=127.0.0.1:5001 gunicorn -k gthread -w 4 --threads 16 api_server:app
+
+(python serve.py starts both with a fresh key.) HTTP workers started with
+EMOTION_INFERENCE_SERVICE set never load TensorFlow or open the camera:
+
+- The newest annotated JPEG and the webcam's emotion state are published
+  into one shared memory block, which every worker reads without a
+  round-trip (a seqlock: the single writer bumps a sequence number around
+  each write and readers retry torn copies).
+- Uploads (/api/analyze), client sessions and track recommendations go
+  over an authenticated local manager connection, so concurrent requests
+  from all workers are still coalesced by one micro-batcher and share one
+  session store, one set of Spotify pools and one served-track history.
+
+The manager connection unpickles what clients send, so anyone holding the
+key can run code in the service: EMOTION_SERVICE_KEY is required on both
+sides and there is no default. Keep the address on loopback.
+"""
+import os
+import sys
+import json
+import time
+import struct
+import signal
+import argparse
+import threading
+from multiprocessing import shared_memory, resource_tracker, AuthenticationError
+from multiprocessing.managers import BaseManager, RemoteError
+
+from frame_scheduler import FramePacer
+from metrics import REGISTRY
+
+# ==================== CONFIGURATION ====================
+SERVICE_ADDRESS = os.getenv("EMOTION_INFERENCE_SERVICE") or "127.0.0.1:5001"
+SHM_NAME = os.getenv("EMOTION_SHM_NAME", "emotion_music_frame")
+SHM_SIZE = 4 * 1024 * 1024   # Header + state JSON + one JPEG
+
+POLL_INTERVAL = 0.01   # Seconds between shared memory checks while waiting
+STALE_SECONDS = 5.0    # No new frame for this long: reattach (service restarted)
+READ_TIMEOUT = 0.5     # Give up on a publish that never completes (writer died mid-write)
+
+# sequence, frame_id, state version, state length, JPEG length
+HEADER = struct.Struct("<QQQII")
+SEQUENCE = struct.Struct("<Q")
+
+# Webcam state before the service has published anything
+EMPTY_STATE = {
+    'session_id': 'local',
+    'emotion': 'Neutral',
+    'confidence': 0.0,
+    'observations': 0,
+    'version': 0,
+    'faces': []
+}
+
+
+def service_key():
+    """Shared secret for the manager connection (EMOTION_SERVICE_KEY, required)"""
+    key = os.getenv("EMOTION_SERVICE_KEY")
+    if not key:
+        raise RuntimeError("EMOTION_SERVICE_KEY must be set to the inference service's secret key")
+    return key.encode()
+
+
+def parse_address(spec):
+    """"host:port" -> (host, port)"""
+    host, _, port = spec.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+class InferenceServiceError(ConnectionError):
+    """The inference service could not be reached or failed the call"""
+
+
+class InferenceServiceAuthError(InferenceServiceError):
+    """The service rejected EMOTION_SERVICE_KEY; retrying won't help"""
+
+
+# ==================== SHARED FRAME ====================
+class SharedFrame:
+    """
+    Latest JPEG frame plus JSON state in one shared memory block
+
+    Single writer, many readers, no locks: the writer makes the sequence
+    number odd before touching the payload and even again afterwards, and
+    a reader accepts a copy only if it saw the same even sequence before
+    and after copying.
+    """
+
+    def __init__(self, name=SHM_NAME, size=SHM_SIZE, create=False):
+        if create:
+            try:
+                # Left behind by a service that was killed
+                stale = shared_memory.SharedMemory(name=name)
+                stale.close()
+                stale.unlink()
+            except FileNotFoundError:
+                pass
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            HEADER.pack_into(self.shm.buf, 0, 0, 0, 0, 0, 0)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            # Python < 3.13 tracks attached blocks too and would unlink the
+            # service's block when this reader exits
+            try:
+                resource_tracker.unregister(self.shm._name, "shared_memory")
+            except Exception:
+                pass
+        self.capacity = self.shm.size - HEADER.size
+        self._sequence = 0
+
+    def write(self, frame_id, version, state, jpeg):
+        """Publish a frame; returns False if it doesn't fit"""
+        state_bytes = json.dumps(state, default=float).encode()
+        if len(state_bytes) + len(jpeg) > self.capacity:
+            return False
+        buf = self.shm.buf
+        self._sequence += 1
+        SEQUENCE.pack_into(buf, 0, self._sequence)
+
+        start = HEADER.size
+        buf[start:start + len(state_bytes)] = state_bytes
+        start += len(state_bytes)
+        buf[start:start + len(jpeg)] = jpeg
+        HEADER.pack_into(buf, 0, self._sequence, frame_id, version, len(state_bytes), len(jpeg))
+
+        self._sequence += 1
+        SEQUENCE.pack_into(buf, 0, self._sequence)
+        return True
+
+    def header(self):
+        """(sequence, frame_id, state version) without copying the payload"""
+        return HEADER.unpack_from(self.shm.buf, 0)[:3]
+
+    def read(self):
+        """
+        Consistent copy of the latest publish
+
+        Returns:
+            (sequence, frame_id, state, jpeg), or None before the first
+            publish and when no consistent copy could be taken within
+            READ_TIMEOUT
+        """
+        buf = self.shm.buf
+        deadline = time.monotonic() + READ_TIMEOUT
+        while time.monotonic() < deadline:
+            sequence, frame_id, _, state_len, jpeg_len = HEADER.unpack_from(buf, 0)
+            if sequence == 0:
+                return None
+            if sequence % 2 == 0:
+                start = HEADER.size
+                state = bytes(buf[start:start + state_len])
+                jpeg = bytes(buf[start + state_len:start + state_len + jpeg_len])
+                if SEQUENCE.unpack_from(buf, 0)[0] == sequence:
+                    return sequence, frame_id, json.loads(state), jpeg
+            time.sleep(0)
+        return None
+
+    def close(self):
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+class ServiceManager(BaseManager):
+    pass
+
+ServiceManager.register('service')
+
+
+# ==================== SERVICE ====================
+class InferenceService:
+    """Methods HTTP workers call over the manager connection"""
+
+    def __init__(self, server):
+        """
+        Args:
+            server: The api_server module, running in local mode
+        """
+        self.server = server
+
+    def analyze_frames(self, session_id, frames):
+        return self.server.analyze_frames(session_id, frames)
+
+    def session_snapshot(self, session_id):
+        return self.server.sessions.get(session_id).snapshot()
+
+    def wait_for_session(self, session_id, version, timeout):
+        return self.server.sessions.get(session_id).wait_for_update(version, timeout=timeout)
+
+    def recommend_tracks(self, emotion, language, seed, session_id, playlists):
+        return self.server.recommend_tracks(emotion, language, seed, session_id, playlists)
+
+    def spotify_status(self):
+        return self.server.spotify_status()
+
+    def metrics(self):
+        # HTTP workers skip everything this process reports
+        return REGISTRY.render()
+
+
+def webcam_state(server, worker, broadcaster):
+    """JSON-safe webcam emotion, faces and capture stats for the shared block"""
+    session = server.sessions.get(server.LOCAL_SESSION)
+    state = session.snapshot()
+    state['version'] = session.version
+    state['faces'] = [
+        {
+            'face_id': face['face_id'],
+            'smoothed': face['smoothed'],
+            'confidence': float(face['confidence']),
+            'box': [int(v) for v in face['box']]
+        }
+        for face in worker.latest_faces()
+    ]
+    state['model_loaded'] = server.pipeline.loaded
+    state['inference'] = worker.scheduler.stats()
+    state['camera'] = worker.cap.stats()
+    state['capture_worker'] = worker.status()
+    state['video_stream'] = broadcaster.stats()
+    state['sessions'] = len(server.sessions)
+    return state
+
+
+def publish_frames(server, shared, stop):
+    """Encode each processed frame once and publish it with the current state"""
+    worker = server.get_capture_worker()
+    broadcaster = server.get_broadcaster()
+    pacer = FramePacer(server.STREAM_MAX_FPS)
+    last_id = None
+    while not stop.is_set():
+        frame_id, frame, _ = worker.wait_for_frame(last_id, timeout=1.0)
+        if frame_id == last_id:
+            continue
+        # Also before the first frame, so the next wait blocks instead of spinning
+        last_id = frame_id
+        if frame is None:
+            continue
+
+        jpeg = broadcaster.snapshot(frame_id, frame)
+        if jpeg is None:
+            continue
+        state = webcam_state(server, worker, broadcaster)
+        if not shared.write(frame_id, state['version'], state, jpeg):
+            print(f"⚠️ Frame {frame_id} ({len(jpeg)} bytes) does not fit in shared memory")
+        pacer.wait()
+
+
+def run_service(address=SERVICE_ADDRESS, shm_name=SHM_NAME):
+    """Open the camera, load the model and serve HTTP workers until stopped"""
+    authkey = service_key()
+    import api_server as server
+    # The address is usually taken from the same variable the HTTP workers
+    # use; this process is the service, so it must not act as a client
+    server.INFERENCE_SERVICE = None
+
+    service = InferenceService(server)
+    ServiceManager.register('service', callable=lambda: service)
+    # Bind first so a busy port fails before the camera and model are opened
+    manager = ServiceManager(address=parse_address(address), authkey=authkey)
+    listener = manager.get_server()
+
+    shared = SharedFrame(shm_name, create=True)
+    stop = threading.Event()
+    print("⏳ Opening camera and loading model...")
+    server.get_capture_worker()
+    server.get_batcher()
+    spotify = server.get_spotify() if server.PREWARM_TRACK_POOLS else None
+    if spotify is not None:
+        spotify.start_prewarm()
+    publisher = threading.Thread(target=publish_frames, args=(server, shared, stop), daemon=True)
+    publisher.start()
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"✅ Inference service on {address} (shared memory '{shm_name}')")
+    try:
+        listener.serve_forever()
+    finally:
+        stop.set()
+        publisher.join(timeout=2.0)
+        worker = server.get_capture_worker()
+        worker.stop()
+        worker.cap.release()
+        shared.close()
+        shared.unlink()
+
+
+# ==================== CLIENT ====================
+class InferenceClient:
+    """
+    HTTP worker side: reads the shared frame and calls the service
+
+    Thread-safe; the manager proxy keeps one connection per thread.
+    Failed calls raise InferenceServiceError and reconnect on next use.
+    """
+
+    def __init__(self, address=SERVICE_ADDRESS, shm_name=SHM_NAME):
+        self.address = address
+        self.authkey = service_key()
+        self.shm_name = shm_name
+        self._lock = threading.Lock()
+        self._proxy = None
+        self._shared = None
+        self._sequence = None
+        self._last_change = 0.0
+
+    # ---------- shared memory ----------
+    def _frame(self):
+        """Attached SharedFrame, or None while the service isn't publishing"""
+        now = time.monotonic()
+        with self._lock:
+            if self._shared is not None and now - self._last_change > STALE_SECONDS:
+                # Nothing new for a while: the service may have been restarted
+                # with a fresh block; other threads may still hold the old one
+                self._shared = None
+            if self._shared is None:
+                try:
+                    self._shared = SharedFrame(self.shm_name)
+                except FileNotFoundError:
+                    return None
+                self._sequence = None
+                self._last_change = now
+            return self._shared
+
+    def _seen(self, sequence):
+        # A moving sequence means the service is publishing into this block
+        with self._lock:
+            if sequence != self._sequence:
+                self._sequence = sequence
+                self._last_change = time.monotonic()
+
+    def _header(self):
+        shared = self._frame()
+        if shared is None:
+            return None
+        header = shared.header()
+        self._seen(header[0])
+        return header
+
+    def latest(self):
+        """(frame_id, jpeg, state) of the newest frame; jpeg is None before the first"""
+        shared = self._frame()
+        data = shared.read() if shared is not None else None
+        if data is None:
+            return 0, None, dict(EMPTY_STATE)
+        sequence, frame_id, state, jpeg = data
+        self._seen(sequence)
+        return frame_id, jpeg, state
+
+    def state(self):
+        """Webcam emotion state, faces and capture stats"""
+        return self.latest()[2]
+
+    def _wait(self, field, last, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            header = self._header()
+            current = header[field] if header is not None else 0
+            if current != last or (deadline is not None and time.monotonic() >= deadline):
+                return current
+            time.sleep(POLL_INTERVAL)
+
+    def wait_for_update(self, version, timeout=None):
+        """Block until the webcam state moves past version; returns the current version"""
+        return self._wait(2, version, timeout)
+
+    def frames(self):
+        """Generator of JPEG bytes for one viewer, newest frame each time"""
+        last_id = None
+        while True:
+            if self._wait(1, last_id, 1.0) == last_id:
+                continue
+            frame_id, jpeg, _ = self.latest()
+            last_id = frame_id
+            if jpeg is not None:
+                yield jpeg
+
+    # ---------- service calls ----------
+    def _call(self, method, *args):
+        try:
+            with self._lock:
+                if self._proxy is None:
+                    manager = ServiceManager(address=parse_address(self.address), authkey=self.authkey)
+                    manager.connect()
+                    self._proxy = manager.service()
+                proxy = self._proxy
+            return getattr(proxy, method)(*args)
+        except AuthenticationError as e:
+            self._reset()
+            raise InferenceServiceAuthError(
+                f"Inference service at {self.address} rejected EMOTION_SERVICE_KEY: {e}") from e
+        except (OSError, EOFError, RemoteError) as e:
+            self._reset()
+            raise InferenceServiceError(f"Inference service unavailable at {self.address}: {e}") from e
+
+    def _reset(self):
+        # Next call reconnects (e.g. to a restarted service)
+        with self._lock:
+            self._proxy = None
+
+    def analyze_frames(self, session_id, frames):
+        return self._call('analyze_frames', session_id, frames)
+
+    def session_snapshot(self, session_id):
+        return self._call('session_snapshot', session_id)
+
+    def wait_for_session(self, session_id, version, timeout=None):
+        return self._call('wait_for_session', session_id, version, timeout)
+
+    def recommend_tracks(self, emotion, language, seed=None, session_id=None, playlists=False):
+        return self._call('recommend_tracks', emotion, language, seed, session_id, playlists)
+
+    def spotify_status(self):
+        return self._call('spotify_status')
+
+    def metrics(self):
+        return self._call('metrics')
+
+    def wait_ready(self, timeout=120.0):
+        """
+        Block until the service answers and has published a frame
+
+        Raises:
+            InferenceServiceError: Not ready within timeout, or the key was rejected
+        """
+        deadline = time.monotonic() + timeout
+        error = InferenceServiceError(f"No frame published by the inference service at {self.address}")
+        while time.monotonic() < deadline:
+            try:
+                self.metrics()
+                if self.latest()[1] is not None:
+                    return
+            except InferenceServiceAuthError:
+                raise
+            except InferenceServiceError as e:
+                error = e
+            time.sleep(0.5)
+        raise error
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--address", default=SERVICE_ADDRESS, help="host:port for HTTP workers to connect to")
+    parser.add_argument("--shm-name", default=SHM_NAME, help="Shared memory block for frames")
+    args = parser.parse_args()
+    try:
+        service_key()
+    except RuntimeError as e:
+        raise SystemExit(f"❌ {e}")
+    run_service(args.address, args.shm_name)
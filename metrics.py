@@ -0,0 +1,172 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+# Seconds; covers sub-millisecond stages up to slow Spotify calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(label_name, label, extra=""):
+    parts = [f'{label_name}="{label}"'] if label_name and label is not None else []
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram, optionally split by a single label
+
+    observe() is a bisect plus three additions under a lock, cheap enough
+    for per-frame hot paths. Rendered in Prometheus text format.
+    """
+
+    def __init__(self, name, help, label=None, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, label=None):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label)
+            if series is None:
+                series = self._series[label] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, label=None):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, label)
+
+    def render(self):
+        with self._lock:
+            series = {label: (list(counts), total, count) for label, (counts, total, count) in self._series.items()}
+        if not series:
+            return []
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label, (counts, total, count) in sorted(series.items(), key=lambda kv: str(kv[0])):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label, label, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label, label)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.label, label)} {count}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter, optionally split by a single label"""
+
+    def __init__(self, name, help, label=None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, label=None):
+        with self._lock:
+            self._values[label] = self._values.get(label, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+        if not values:
+            return []
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label, value in sorted(values.items(), key=lambda kv: str(kv[0])):
+            lines.append(f"{self.name}{_labels(self.label, label)} {value}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Named histograms and counters plus collectors evaluated at scrape time
+
+    A collector is a callable returning (name, type, help, value) tuples,
+    for figures other components already track (frame counts, cache stats)
+    so the hot path doesn't pay for them twice.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def histogram(self, name, help, label=None, buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help, label=label, buckets=buckets)
+
+    def counter(self, name, help, label=None):
+        return self._get_or_create(Counter, name, help, label=label)
+
+    def collector(self, fn):
+        """Register a scrape-time collector (usable as a decorator)"""
+        with self._lock:
+            self._collectors.append(fn)
+        return fn
+
+    def render(self, collectors=None):
+        """
+        All metrics in Prometheus text exposition format
+
+        Metrics that were never observed are left out, so processes sharing
+        this module (HTTP workers and the inference service) can concatenate
+        their output without repeating a metric name.
+
+        Args:
+            collectors: Only run these collectors (default: all registered)
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+            if collectors is None:
+                collectors = list(self._collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collect in collectors:
+            try:
+                samples = list(collect())
+            except Exception as e:
+                print(f"⚠️ Metrics collector failed: {e}")
+                continue
+            for name, kind, help, value in samples:
+                if value is None:
+                    continue
+                lines.extend([f"# HELP {name} {help}", f"# TYPE {name} {kind}", f"{name} {value}"])
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry shared by the pipeline, Spotify helper and server
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "emotion_stage_seconds", "Time spent per pipeline stage", label="stage"
+)
+CAPTURE_TO_RESULT_SECONDS = REGISTRY.histogram(
+    "emotion_capture_to_result_seconds", "Time from frame capture to emotion result"
+)
+SPOTIFY_REQUEST_SECONDS = REGISTRY.histogram(
+    "spotify_request_seconds", "Spotify Web API call latency (cache misses only)", label="type"
+)
+SPOTIFY_ERRORS = REGISTRY.counter(
+    "spotify_errors_total", "Failed Spotify Web API calls", label="reason"
+)
@@ -0,0 +1,117 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import numpy as np
+
+
+class BatchTimeout(RuntimeError):
+    """No prediction within the caller's timeout (the batcher is overloaded)"""
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent inference requests into one forward pass
+
+    Callers submit (N, 64, 64, 1) face batches and get a Future. A single
+    worker thread waits up to max_wait_ms after the first pending request
+    (or until max_batch faces are queued), concatenates everything into
+    one predict() call and hands each caller its slice of the output.
+    """
+
+    def __init__(self, predict_fn, max_batch=32, max_wait_ms=5.0):
+        self.predict_fn = predict_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._pending = deque()
+        self._pending_faces = 0
+        self._cond = threading.Condition()
+        self._running = True
+
+        self.batches = 0
+        self.items = 0
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, faces):
+        """Queue a face batch; the Future resolves to its (N, 7) predictions"""
+        future = Future()
+        if len(faces) == 0:
+            future.set_result(np.empty((0, 7), dtype=np.float32))
+            return future
+
+        with self._cond:
+            self._pending.append((faces, future))
+            self._pending_faces += len(faces)
+            self._cond.notify()
+        return future
+
+    def predict(self, faces, timeout=5.0):
+        """
+        Blocking helper around submit()
+
+        Raises:
+            BatchTimeout: No result within timeout; a request still queued
+                is cancelled so no forward pass is spent on it
+        """
+        future = self.submit(faces)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise BatchTimeout(f"No prediction within {timeout}s") from None
+
+    def close(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join(timeout=2.0)
+
+    def _take_batch(self):
+        with self._cond:
+            while self._running and not self._pending:
+                self._cond.wait()
+            if not self._running:
+                return []
+
+            # Give concurrent requests a few ms to join this batch
+            deadline = time.perf_counter() + self.max_wait
+            while self._pending_faces < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch, count = [], 0
+            while self._pending and (not batch or count + len(self._pending[0][0]) <= self.max_batch):
+                faces, future = self._pending.popleft()
+                self._pending_faces -= len(faces)
+                if not future.set_running_or_notify_cancel():
+                    continue  # Caller stopped waiting
+                batch.append((faces, future))
+                count += len(faces)
+            return batch
+
+    def _run(self):
+        while self._running:
+            batch = self._take_batch()
+            if not batch:
+                continue
+
+            try:
+                preds = self.predict_fn(np.concatenate([faces for faces, _ in batch]))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+
+            offset = 0
+            for faces, future in batch:
+                future.set_result(preds[offset:offset + len(faces)])
+                offset += len(faces)
@@ -0,0 +1,78 @@
+"""
+Production server: gunicorn HTTP workers in front of one inference process
+
+    python serve.py --workers 4 --threads 16
+    EMOTION_SERVICE_KEY=... python serve.py --no-service   # service already running
+
+Starts inference_service.py (camera, model, sessions, Spotify track pools
+and served-track history, all held once) and then gunicorn with threaded
+workers that reach it through shared memory and a local connection, so
+HTTP concurrency scales across cores without another copy of the model
+or more Spotify traffic per worker. Video and SSE streams each hold a
+worker thread for as long as they are open; size --threads accordingly.
+Needs gunicorn (Linux/macOS); `python api_server.py` remains the
+single-process development server.
+"""
+import os
+import sys
+import secrets
+import argparse
+import subprocess
+
+from inference_service import InferenceClient, InferenceServiceError, SERVICE_ADDRESS
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_gunicorn(bind, workers, threads):
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise SystemExit("❌ Production serving needs gunicorn (pip install gunicorn)")
+
+    class Application(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", bind)
+            self.cfg.set("workers", workers)
+            self.cfg.set("worker_class", "gthread")
+            self.cfg.set("threads", threads)
+
+        def load(self):
+            from api_server import app
+            return app
+
+    Application().run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--bind", default="0.0.0.0:5000")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="HTTP worker processes")
+    parser.add_argument("--threads", type=int, default=16, help="Request threads per worker")
+    parser.add_argument("--service", default=SERVICE_ADDRESS, help="Inference service host:port")
+    parser.add_argument("--no-service", action="store_true", help="Connect to a running inference_service.py")
+    args = parser.parse_args()
+
+    # Workers and the service read these when they start
+    os.environ["EMOTION_INFERENCE_SERVICE"] = args.service
+    if args.no_service:
+        if not os.getenv("EMOTION_SERVICE_KEY"):
+            raise SystemExit("❌ --no-service needs EMOTION_SERVICE_KEY set to the running service's key")
+    else:
+        os.environ.setdefault("EMOTION_SERVICE_KEY", secrets.token_hex(16))
+
+    service = None
+    if not args.no_service:
+        service = subprocess.Popen([sys.executable, os.path.join(ROOT, "inference_service.py"),
+                                    "--address", args.service], cwd=ROOT)
+    try:
+        try:
+            InferenceClient(args.service).wait_ready()
+        except InferenceServiceError as e:
+            raise SystemExit(f"❌ {e}")
+        print(f"✅ Inference service ready; starting {args.workers} worker(s) x {args.threads} threads on {args.bind}")
+        run_gunicorn(args.bind, args.workers, args.threads)
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait(timeout=10)
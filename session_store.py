@@ -0,0 +1,149 @@
+import time
+import threading
+from collections import OrderedDict
+
+# Session fed by the server's own webcam; never evicted
+LOCAL_SESSION = "local"
+
+
+class Session:
+    """Emotion state for one client, updated under its own lock"""
+
+    def __init__(self, session_id, smoother):
+        self.session_id = session_id
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.smoother = smoother
+        self.emotion = "Neutral"
+        self.confidence = 0.0
+        self.observations = 0
+        self.version = 0
+        self.created = time.time()
+        self.last_seen = self.created
+
+    def observe(self, label, probs, confidence, vote=True):
+        """
+        Record one prediction for this client
+
+        Args:
+            label: Predicted emotion label
+            probs: Class-weighted probability vector
+            confidence: Confidence of the predicted label
+            vote: Whether the prediction passed the confidence threshold
+        """
+        with self.lock:
+            if vote:
+                self.smoother.update(label, probs, confidence)
+            smoothed = self.smoother.result()
+            if smoothed:
+                self.emotion = smoothed
+            self.confidence = confidence
+            self.observations += 1
+            self.last_seen = time.time()
+            self._notify()
+
+    def set(self, emotion, confidence):
+        """Overwrite the state with an already-smoothed result"""
+        with self.lock:
+            self.emotion = emotion
+            self.confidence = confidence
+            self.observations += 1
+            self.last_seen = time.time()
+            self._notify()
+
+    def _notify(self):
+        # Caller holds self.lock
+        self.version += 1
+        self.changed.notify_all()
+
+    def wait_for_update(self, version, timeout=None):
+        """
+        Block until the state moves past version or timeout expires
+
+        Returns:
+            The current version
+        """
+        with self.changed:
+            self.changed.wait_for(lambda: self.version != version, timeout=timeout)
+            return self.version
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'session_id': self.session_id,
+                'emotion': self.emotion,
+                'confidence': self.confidence,
+                'observations': self.observations
+            }
+
+
+class SessionStore:
+    """
+    Thread-safe, bounded map of session id -> Session
+
+    The store lock only guards the dict itself; per-session updates take
+    the session's own lock so clients never contend with each other.
+    Sessions idle for longer than idle_timeout are swept out, and the
+    least recently used ones are dropped beyond max_sessions.
+    """
+
+    def __init__(self, smoother_factory, max_sessions=500, idle_timeout=600.0, sweep_interval=30.0):
+        self.smoother_factory = smoother_factory
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = time.time()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def get(self, session_id):
+        """Return the session for this id, creating it if needed"""
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = Session(session_id, self.smoother_factory())
+                self._sessions[session_id] = session
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_seen = now
+
+            if now - self._last_sweep >= self.sweep_interval:
+                self._evict_idle(now)
+            while len(self._sessions) > self.max_sessions:
+                oldest = next(iter(self._sessions))
+                if oldest == session_id:
+                    break
+                self._remove(oldest)
+
+        return session
+
+    def peek(self, session_id):
+        """Existing session or None, without creating or touching it"""
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def evict_idle(self, now=None):
+        with self._lock:
+            return self._evict_idle(now or time.time())
+
+    def _evict_idle(self, now):
+        self._last_sweep = now
+        stale = [
+            sid for sid, s in self._sessions.items()
+            if sid != LOCAL_SESSION and now - s.last_seen > self.idle_timeout
+        ]
+        for sid in stale:
+            self._remove(sid)
+        return len(stale)
+
+    def _remove(self, session_id):
+        if session_id == LOCAL_SESSION:
+            # Keep the webcam session; just mark it most recent
+            self._sessions.move_to_end(session_id)
+            return
+        del self._sessions[session_id]
@@ -1,9 +1,17 @@
 import spotipy
 from spotipy.oauth2 import SpotifyClientCredentials
+import requests
+from requests.adapters import HTTPAdapter
 import os
 from dotenv import load_dotenv
 import random
 import time
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from track_ranking import TrackCandidates, select_tracks
+from metrics import SPOTIFY_REQUEST_SECONDS, SPOTIFY_ERRORS
 
 # Load environment variables
 load_dotenv()
@@ -114,26 +122,352 @@ EMOTION_TO_SEARCH = {
     ]
 }
 
+# Search offsets used for variety. A small fixed set keeps the number of
+# distinct (query, market, offset, limit) keys low enough to cache well.
+SEARCH_OFFSETS = (0, 20, 40, 60, 80, 100)
+
+# Search result cache settings
+CACHE_TTL_SECONDS = 30 * 60
+CACHE_MAX_ENTRIES = 2048
+
+# HTTP behaviour
+REQUEST_TIMEOUT = 5                         # Per-request connect/read timeout (s)
+SEARCH_DEADLINE = 3.0                       # Return partial results after this (s)
+HTTP_POOL_SIZE = 16                         # Pooled keep-alive connections
+SEARCH_WORKERS = 8                          # Concurrent searches
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5                         # Base delay, doubled per attempt (s)
+MAX_RETRY_AFTER = 10.0                      # Give up rather than wait longer (s)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Pre-warmed candidate pools per (emotion, language)
+POOL_SEARCH_LIMIT = 50                      # Spotify's max page size
+POOL_REFRESH_SECONDS = 15 * 60
+POOL_MAX_AGE_SECONDS = 2 * POOL_REFRESH_SECONDS
+
+# Diversity limits when ranking candidates
+MAX_TRACKS_PER_ARTIST = 2
+
+# Recently-served track history, so sessions don't get repeats
+HISTORY_SIZE = 200                          # Track URIs remembered per session
+HISTORY_MAX_SESSIONS = 1000                 # Least recently active dropped first
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ttl seconds"""
+    
+    def __init__(self, maxsize=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+    
+    def get(self, key):
+        """Cached value or None if missing/expired"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+    
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._data),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 3) if total else 0.0
+            }
+
+class ServedHistory:
+    """Bounded set of recently served track URIs (oldest forgotten first)"""
+    
+    def __init__(self, maxlen=HISTORY_SIZE):
+        self.maxlen = maxlen
+        self._order = deque()
+        self._uris = set()
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._uris)
+    
+    def __contains__(self, uri):
+        return uri in self._uris
+    
+    def add(self, uris):
+        with self._lock:
+            for uri in uris:
+                if not uri or uri in self._uris:
+                    continue
+                self._order.append(uri)
+                self._uris.add(uri)
+                if len(self._order) > self.maxlen:
+                    self._uris.discard(self._order.popleft())
+    
+    def clear(self):
+        with self._lock:
+            self._order.clear()
+            self._uris.clear()
+
 class SpotifyMoodRecommender:
     """Spotify music recommender with maximum variety and multi-language support"""
     
-    def __init__(self):
-        """Initialize Spotify client with Client Credentials"""
+    def __init__(self, client=None, api_prefix=None):
+        """
+        Initialize Spotify client with Client Credentials
+        
+        Args:
+            client: Optional object with a spotipy-compatible search()
+                    (e.g. a local fake for tests); skips credentials
+            api_prefix: Web API base URL override (default SPOTIFY_API_PREFIX
+                        env), e.g. a local fake server; credentials optional
+        """
+        self.cache = TTLCache()
+        self.pools = {}
+        self._pool_lock = threading.Lock()
+        self.history = OrderedDict()
+        self._history_lock = threading.Lock()
+        self._prewarm_thread = None
+        self._prewarm_stop = threading.Event()
+        self._pool_rng = random.Random()
+        self._executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="spotify")
+        
+        if client is not None:
+            self.sp = client
+            return
+        
+        api_prefix = api_prefix or os.getenv("SPOTIFY_API_PREFIX")
         self.client_id = os.getenv("SPOTIFY_CLIENT_ID")
         self.client_secret = os.getenv("SPOTIFY_CLIENT_SECRET")
         
-        if not self.client_id or not self.client_secret:
+        if api_prefix and not (self.client_id and self.client_secret):
+            # Local stand-in API: any static token will do
+            auth = {'auth': 'local-fake-token'}
+        elif not self.client_id or not self.client_secret:
             raise ValueError("Spotify credentials not found in .env file!")
+        else:
+            auth = {'auth_manager': SpotifyClientCredentials(
+                client_id=self.client_id,
+                client_secret=self.client_secret
+            )}
+        
+        # One pooled keep-alive session shared by all searches; retries are
+        # handled in _search so Retry-After can be honoured with a cap
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
         
-        auth_manager = SpotifyClientCredentials(
-            client_id=self.client_id,
-            client_secret=self.client_secret
+        self.sp = spotipy.Spotify(
+            requests_session=session,
+            requests_timeout=REQUEST_TIMEOUT,
+            retries=0,
+            status_retries=0,
+            **auth
         )
-        self.sp = spotipy.Spotify(auth_manager=auth_manager)
+        if api_prefix:
+            self.sp.prefix = api_prefix.rstrip('/') + '/'
         
         print("✅ Spotify client initialized!")
     
-    def get_tracks_for_emotion(self, emotion, limit=5, language="Mixed"):
+    def _search(self, query, search_type, limit, market, offset, refresh=False):
+        """
+        Spotify search with TTL/LRU caching
+        
+        Args:
+            refresh: Skip the cached entry and fetch anew (the result is
+                     still cached for on-demand searches)
+        
+        Returns:
+            List of result items (tracks or playlists)
+        """
+        key = (search_type, query, market, offset, limit)
+        items = None if refresh else self.cache.get(key)
+        if items is not None:
+            return items
+        
+        for attempt in range(MAX_RETRIES + 1):
+            started = time.perf_counter()
+            try:
+                results = self.sp.search(
+                    q=query, 
+                    type=search_type, 
+                    limit=limit,
+                    market=market,
+                    offset=offset
+                )
+                SPOTIFY_REQUEST_SECONDS.observe(time.perf_counter() - started, search_type)
+                break
+            except spotipy.SpotifyException as e:
+                SPOTIFY_REQUEST_SECONDS.observe(time.perf_counter() - started, search_type)
+                SPOTIFY_ERRORS.inc(label=str(e.http_status))
+                if e.http_status not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                    raise
+                delay = self._retry_delay(attempt, (e.headers or {}).get('Retry-After'))
+                if delay is None:
+                    raise
+            except requests.exceptions.RequestException as e:
+                SPOTIFY_REQUEST_SECONDS.observe(time.perf_counter() - started, search_type)
+                SPOTIFY_ERRORS.inc(label="timeout" if isinstance(e, requests.exceptions.Timeout) else "network")
+                if attempt == MAX_RETRIES:
+                    raise
+                delay = self._retry_delay(attempt)
+            time.sleep(delay)
+        
+        items = (results or {}).get(search_type + 's', {}).get('items', []) or []
+        self.cache.set(key, items)
+        return items
+    
+    @staticmethod
+    def _retry_delay(attempt, retry_after=None):
+        """Backoff delay for a retry, or None if Retry-After is too long to wait"""
+        if retry_after is not None:
+            try:
+                delay = float(retry_after)
+            except (TypeError, ValueError):
+                delay = RETRY_BACKOFF * (2 ** attempt)
+            return delay if delay <= MAX_RETRY_AFTER else None
+        return RETRY_BACKOFF * (2 ** attempt) * (0.5 + random.random())
+    
+    def _search_many(self, searches, deadline=None):
+        """
+        Run several searches concurrently
+        
+        Args:
+            searches: List of (query, type, limit, market, offset) tuples
+            deadline: Seconds to wait before returning what has finished
+                      (default SEARCH_DEADLINE)
+            
+        Returns:
+            Combined items of the searches that completed in time
+        """
+        futures = [self._executor.submit(self._search, *args) for args in searches]
+        done, not_done = wait(futures, timeout=SEARCH_DEADLINE if deadline is None else deadline)
+        
+        items = []
+        for future in futures:
+            if future not in done:
+                continue
+            try:
+                items.extend(future.result())
+            except Exception as e:
+                print(f"⚠️ Spotify search failed: {e}")
+        
+        if not_done:
+            print(f"⚠️ {len(not_done)}/{len(futures)} Spotify searches timed out, using partial results")
+        return items
+    
+    # ==================== TRACK POOLS ====================
+    def refresh_pool(self, emotion, language):
+        """
+        Fetch a fresh candidate pool for one (emotion, language) pair
+        
+        Runs one search per emotion query, spreading them over the
+        language's markets, and stores the combined items. Searches bypass
+        the cache, whose TTL outlives the refresh interval.
+        
+        Returns:
+            Number of candidate items in the pool
+        """
+        lang_config = LANGUAGE_CONFIG.get(language, LANGUAGE_CONFIG["Mixed"])
+        markets = lang_config["markets"]
+        
+        items = []
+        for i, query in enumerate(EMOTION_TO_SEARCH[emotion]):
+            market = markets[i % len(markets)]
+            offset = self._pool_rng.choice(SEARCH_OFFSETS)
+            items.extend(self._search(query + lang_config["search_suffix"], 'track', POOL_SEARCH_LIMIT,
+                                      market, offset, refresh=True))
+        
+        # Parsed once here; requests only rank the columnar candidates
+        candidates = TrackCandidates(items)
+        with self._pool_lock:
+            self.pools[(emotion, language)] = (time.time(), candidates)
+        return len(candidates)
+    
+    def served_history(self, session_id):
+        """The ServedHistory for a session, created on first use"""
+        with self._history_lock:
+            history = self.history.get(session_id)
+            if history is None:
+                history = ServedHistory()
+                self.history[session_id] = history
+                while len(self.history) > HISTORY_MAX_SESSIONS:
+                    self.history.popitem(last=False)
+            else:
+                self.history.move_to_end(session_id)
+            return history
+    
+    def _pool_candidates(self, emotion, language):
+        """A fresh pool's TrackCandidates, or None if cold/stale"""
+        with self._pool_lock:
+            entry = self.pools.get((emotion, language))
+        if not entry or time.time() - entry[0] > POOL_MAX_AGE_SECONDS:
+            return None
+        return entry[1]
+    
+    def start_prewarm(self, emotions=None, languages=None, interval=POOL_REFRESH_SECONDS, pause=0.2):
+        """
+        Keep every (emotion, language) pool filled from a background thread
+        
+        Args:
+            emotions: Emotions to pre-warm (default: all)
+            languages: Languages to pre-warm (default: all, Mixed first)
+            interval: Seconds between full refresh rounds
+            pause: Delay between individual pool refreshes (rate limiting)
+        """
+        if self._prewarm_thread is not None:
+            return
+        
+        pairs = [(e, l) for l in (languages or LANGUAGE_CONFIG) for e in (emotions or EMOTION_TO_SEARCH)]
+        
+        def run():
+            while not self._prewarm_stop.is_set():
+                for emotion, language in pairs:
+                    if self._prewarm_stop.is_set():
+                        return
+                    try:
+                        self.refresh_pool(emotion, language)
+                    except Exception as e:
+                        print(f"⚠️ Pool refresh failed for {emotion}/{language}: {e}")
+                    self._prewarm_stop.wait(pause)
+                self._prewarm_stop.wait(interval)
+        
+        self._prewarm_stop.clear()
+        self._prewarm_thread = threading.Thread(target=run, daemon=True)
+        self._prewarm_thread.start()
+    
+    def stop_prewarm(self):
+        self._prewarm_stop.set()
+        if self._prewarm_thread is not None:
+            self._prewarm_thread.join(timeout=2.0)
+            self._prewarm_thread = None
+    
+    def get_tracks_for_emotion(self, emotion, limit=5, language="Mixed", seed=None,
+                               max_per_album=None, exclude=None, session_id=None):
         """
         Search for diverse tracks with maximum variety
         Different results for each user and each search
@@ -142,6 +476,12 @@ class SpotifyMoodRecommender:
             emotion: One of the 7 emotions
             limit: Number of tracks to return
             language: Language preference
+            seed: Optional seed for reproducible selection; each call
+                  uses its own Random instance, never the global one
+            max_per_album: Optional cap on tracks from the same album
+            exclude: Optional set of track URIs to skip (recently served)
+            session_id: Optional session whose recently served tracks are
+                        skipped, and which remembers the tracks returned
             
         Returns:
             List of track dictionaries (unique each time)
@@ -149,117 +489,70 @@ class SpotifyMoodRecommender:
         if emotion not in EMOTION_TO_SEARCH:
             emotion = "Neutral"
         
+        # Per-request RNG: thread-safe and doesn't disturb global random
+        rng = random.Random(seed)
+        
         # Get language config
         lang_config = LANGUAGE_CONFIG.get(language, LANGUAGE_CONFIG["Mixed"])
-        market = random.choice(lang_config["markets"])
+        market = rng.choice(lang_config["markets"])
         search_suffix = lang_config["search_suffix"]
         
-        # Time-based randomization for different results per user/session
-        random_seed = int(time.time() * 1000) % 10000
-        random.seed(random_seed)
-        
         # Pick random query
         queries = EMOTION_TO_SEARCH[emotion]
-        query = random.choice(queries)
+        query = rng.choice(queries)
         full_query = query + search_suffix
         
         try:
-            all_items = []
+            # Serve from the pre-warmed pool when available
+            candidates = self._pool_candidates(emotion, language)
             
-            # Make 2 searches with different offsets for variety
-            for _ in range(2):
-                search_offset = random.randint(0, 100)
-                
-                results = self.sp.search(
-                    q=full_query, 
-                    type='track', 
-                    limit=limit * 3,
-                    market=market,
-                    offset=search_offset
-                )
-                
-                items = (results or {}).get('tracks', {}).get('items', []) or []
-                all_items.extend(items)
-            
-            # Shuffle for randomness
-            random.shuffle(all_items)
+            if not candidates:
+                # Make 2 concurrent searches with different offsets for variety
+                # (usually served from cache; variety comes from local ranking jitter)
+                candidates = TrackCandidates(self._search_many([
+                    (full_query, 'track', limit * 3, market, search_offset)
+                    for search_offset in rng.sample(SEARCH_OFFSETS, 2)
+                ]))
             
-            tracks = []
-            seen_track_names = set()
-            artist_count = {}
+            history = self.served_history(session_id) if session_id is not None else None
+            if history is not None and exclude is None:
+                # Freshness comes from filtering candidates, not extra searches
+                exclude = history
             
-            # Sort by popularity with random adjustment
-            items_sorted = sorted(
-                all_items, 
-                key=lambda x: x.get('popularity', 0) + random.randint(-20, 20), 
-                reverse=True
+            # Rank once over columnar candidates: popularity + jitter,
+            # then dedupe and per-artist/album caps in a single pass
+            tracks = select_tracks(
+                candidates, limit, rng,
+                max_per_artist=MAX_TRACKS_PER_ARTIST,
+                max_per_album=max_per_album,
+                exclude=exclude
             )
             
-            for t in items_sorted:
-                if len(tracks) >= limit:
-                    break
-                
-                name = (t or {}).get('name') or "Untitled"
-                artists = (t or {}).get('artists') or []
-                artist = (artists[0].get('name') if artists and artists[0] else "Unknown")
-                
-                track_key = f"{name.lower()}_{artist.lower()}"
-                
-                # Skip duplicates
-                if track_key in seen_track_names:
-                    continue
-                
-                # Max 2 tracks per artist
-                if artist_count.get(artist, 0) >= 2:
-                    continue
-                
-                # Get album info
-                album_obj = (t or {}).get('album') or {}
-                album_name = album_obj.get('name') or ""
-                album_images = album_obj.get('images') or []
-                
-                album_art = None
-                if album_images:
-                    album_art = next((img['url'] for img in album_images if img.get('height') == 300), None)
-                    if not album_art and album_images:
-                        album_art = album_images[0].get('url')
-                
-                preview_url = (t or {}).get('preview_url')
-                url = ((t or {}).get('external_urls') or {}).get('spotify') or ""
-                uri = (t or {}).get('uri') or ""
-                popularity = (t or {}).get('popularity', 0)
-                
-                tracks.append({
-                    'name': name,
-                    'artist': artist,
-                    'album': album_name,
-                    'album_art': album_art,
-                    'preview_url': preview_url,
-                    'url': url,
-                    'uri': uri,
-                    'popularity': popularity
-                })
-                
-                seen_track_names.add(track_key)
-                artist_count[artist] = artist_count.get(artist, 0) + 1
-            
-            # Reset random seed
-            random.seed()
+            if len(tracks) < limit and history is not None and exclude is history:
+                # Session has heard (nearly) everything here; allow repeats
+                history.clear()
+                tracks = select_tracks(
+                    candidates, limit, rng,
+                    max_per_artist=MAX_TRACKS_PER_ARTIST,
+                    max_per_album=max_per_album
+                )
             
+            if history is not None:
+                history.add(t['uri'] for t in tracks)
             return tracks
         
         except Exception as e:
             print(f"❌ Error searching tracks: {e}")
-            random.seed()
             return []
     
-    def get_playlists_for_emotion(self, emotion, limit=5):
+    def get_playlists_for_emotion(self, emotion, limit=5, seed=None):
         """
         Search for popular playlists matching the emotion
         
         Args:
             emotion: Detected emotion
             limit: Number of playlists
+            seed: Optional seed for reproducible query/offset choice
             
         Returns:
             List of playlist dictionaries
@@ -267,22 +560,15 @@ class SpotifyMoodRecommender:
         if emotion not in EMOTION_TO_SEARCH:
             emotion = "Neutral"
         
+        rng = random.Random(seed)
         queries = EMOTION_TO_SEARCH[emotion]
-        query = random.choice(queries)
+        query = rng.choice(queries)
         
         try:
-            offset = random.randint(0, 10)
-            
-            results = self.sp.search(
-                q=query, 
-                type='playlist', 
-                limit=limit,
-                market='US',
-                offset=offset
-            )
+            offset = rng.randint(0, 10)
+            items = self._search(query, 'playlist', limit, 'US', offset)
             
             playlists = []
-            items = (results or {}).get('playlists', {}).get('items', []) or []
             
             for pl in items:
                 name = (pl or {}).get('name') or "Untitled Playlist"
@@ -305,6 +591,23 @@ class SpotifyMoodRecommender:
             print(f"❌ Error searching playlists: {e}")
             return []
 
+    def get_recommendations(self, emotion, limit=5, language="Mixed", playlist_limit=5, seed=None, session_id=None):
+        """
+        Tracks and playlists for an emotion, fetched in parallel
+        
+        Returns:
+            Dict with 'tracks' and 'playlists' lists
+        """
+        playlists_future = self._executor.submit(self.get_playlists_for_emotion, emotion, playlist_limit, seed)
+        tracks = self.get_tracks_for_emotion(emotion, limit=limit, language=language, seed=seed, session_id=session_id)
+        
+        try:
+            playlists = playlists_future.result(timeout=SEARCH_DEADLINE)
+        except Exception:
+            playlists = []
+        
+        return {'tracks': tracks, 'playlists': playlists}
+
 # Quick test function
 def test_spotify_connection():
     """Test Spotify API with variety and languages"""
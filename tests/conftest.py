@@ -0,0 +1,92 @@
+import os
+import sys
+import time
+import random
+import threading
+
+import pytest
+
+# Modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+THREADS = 16
+
+
+class FakeSpotify:
+    """
+    Deterministic stand-in for spotipy.Spotify.search
+
+    Tests can slow down individual queries (delays: {query: seconds}) or
+    queue exceptions to raise on the next calls (errors).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.delays = {}
+        self.errors = []
+
+    def search(self, q, type, limit, market, offset):
+        with self.lock:
+            self.calls += 1
+            error = self.errors.pop(0) if self.errors else None
+        if error is not None:
+            raise error
+        if q in self.delays:
+            time.sleep(self.delays[q])
+        items = []
+        for i in range(offset, offset + limit):
+            rng = random.Random(f"{q}|{market}|{i}")
+            track_id = f"{q}-{market}-{i}".replace(" ", "_")
+            items.append({
+                'id': track_id,
+                'name': f"Song {i}",
+                'artists': [{'name': f"Artist {rng.randrange(12)}"}],
+                'album': {'id': f"album{rng.randrange(30)}", 'name': "Album", 'images': []},
+                'popularity': rng.randrange(100),
+                'preview_url': None,
+                'external_urls': {'spotify': f"https://open.example/track/{track_id}"},
+                'uri': f"spotify:track:{track_id}"
+            })
+        return {type + 's': {'items': items}}
+
+
+@pytest.fixture
+def fake_spotify():
+    return FakeSpotify()
+
+
+@pytest.fixture
+def recommender(fake_spotify):
+    pytest.importorskip("spotipy")
+    from spotify_helper import SpotifyMoodRecommender
+
+    recommender = SpotifyMoodRecommender(client=fake_spotify)
+    yield recommender
+    recommender.stop_prewarm()
+
+
+@pytest.fixture
+def run_threads():
+    """Run target(i) on THREADS threads at once and re-raise the first failure"""
+
+    def run(target, threads=THREADS):
+        errors = []
+        start = threading.Barrier(threads)
+
+        def wrapped(i):
+            try:
+                start.wait()
+                target(i)
+            except BaseException as e:
+                errors.append(e)
+
+        workers = [threading.Thread(target=wrapped, args=(i,)) for i in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        if errors:
+            raise errors[0]
+
+    return run
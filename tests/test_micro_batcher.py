@@ -0,0 +1,132 @@
+import threading
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from micro_batcher import MicroBatcher, BatchTimeout
+
+
+def faces_for(client, count):
+    """count 64x64 faces filled with the client's id"""
+    return np.full((count, 64, 64, 1), client, dtype=np.float32)
+
+
+class RecordingModel:
+    """predict() echoing each face's fill value in column 0, recording batch sizes"""
+
+    def __init__(self):
+        self.sizes = []
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def predict(self, batch):
+        self.entered.set()
+        self.release.wait()
+        self.sizes.append(len(batch))
+        out = np.zeros((len(batch), 7), dtype=np.float32)
+        out[:, 0] = batch[:, 0, 0, 0]
+        return out
+
+
+@pytest.fixture
+def model():
+    return RecordingModel()
+
+
+@pytest.fixture
+def batcher(model):
+    batcher = MicroBatcher(model.predict, max_batch=32, max_wait_ms=50.0)
+    yield batcher
+    model.release.set()
+    batcher.close()
+
+
+def test_concurrent_requests_share_forward_passes(batcher, model, run_threads):
+    results = {}
+
+    def call(i):
+        results[i] = batcher.predict(faces_for(i, 1 + i % 2))
+
+    run_threads(call, threads=8)
+    # Every caller gets exactly its own rows back
+    for i, preds in results.items():
+        assert preds.shape == (1 + i % 2, 7)
+        assert (preds[:, 0] == i).all()
+    assert batcher.items == 8
+    assert batcher.batches < 8
+    assert sum(model.sizes) == sum(1 + i % 2 for i in range(8))
+
+
+def test_batches_never_exceed_max_batch(model, run_threads):
+    batcher = MicroBatcher(model.predict, max_batch=4, max_wait_ms=50.0)
+    try:
+        run_threads(lambda i: batcher.predict(faces_for(i, 2)), threads=8)
+    finally:
+        batcher.close()
+    assert max(model.sizes) <= 4
+    assert sum(model.sizes) == 16
+
+
+def test_empty_request_resolves_without_a_forward_pass(batcher, model):
+    assert batcher.predict(faces_for(0, 0)).shape == (0, 7)
+    assert model.sizes == []
+
+
+def test_model_errors_reach_every_caller_in_the_batch(run_threads):
+    def broken(batch):
+        raise RuntimeError("model failed")
+
+    batcher = MicroBatcher(broken, max_wait_ms=50.0)
+    errors = []
+
+    def call(i):
+        with pytest.raises(RuntimeError, match="model failed"):
+            batcher.predict(faces_for(i, 1))
+        errors.append(i)
+
+    try:
+        run_threads(call, threads=4)
+    finally:
+        batcher.close()
+    assert sorted(errors) == [0, 1, 2, 3]
+
+
+def test_timeout_raises_and_skips_the_abandoned_request(batcher, model):
+    model.release.clear()
+    stuck = batcher.submit(faces_for(1, 1))
+    assert model.entered.wait(timeout=2.0)  # Worker is held inside predict()
+    with pytest.raises(BatchTimeout):
+        batcher.predict(faces_for(2, 3), timeout=0.05)
+
+    model.release.set()
+    assert stuck.result(timeout=2.0)[0, 0] == 1
+    assert batcher.predict(faces_for(3, 1), timeout=2.0)[0, 0] == 3
+    # The timed-out request's 3 faces never reached the model
+    assert 3 not in model.sizes
+    assert sum(model.sizes) == 2
+
+
+@pytest.fixture
+def api_client(monkeypatch):
+    pytest.importorskip("flask")
+    pytest.importorskip("cv2")
+    import api_server
+
+    monkeypatch.setattr(api_server, "INFERENCE_SERVICE", None)
+    return api_server, api_server.app.test_client()
+
+
+def test_analyze_returns_503_when_inference_times_out(api_client, monkeypatch):
+    import cv2
+    api_server, client = api_client
+
+    def overloaded(session_id, frames):
+        raise BatchTimeout("No prediction within 5.0s")
+
+    monkeypatch.setattr(api_server, "analyze_frames", overloaded)
+    ok, jpeg = cv2.imencode('.jpg', np.full((48, 48), 128, dtype=np.uint8))
+    response = client.post('/api/analyze', data=jpeg.tobytes(), content_type='image/jpeg')
+    assert response.status_code == 503
+    assert 'overloaded' in response.get_json()['error']
@@ -0,0 +1,124 @@
+import threading
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from emotion_smoothing import make_smoother
+from session_store import SessionStore, LOCAL_SESSION
+
+EMOTIONS = ["Angry", "Disgust", "Fear", "Happy", "Sad", "Surprise", "Neutral"]
+
+
+def majority():
+    return make_smoother("majority", EMOTIONS, window_size=5, min_votes=1)
+
+
+@pytest.fixture
+def store():
+    return SessionStore(majority, max_sessions=3, idle_timeout=60.0, sweep_interval=3600.0)
+
+
+def test_get_returns_the_same_session(store):
+    assert store.get("a") is store.get("a")
+    assert store.get("a") is not store.get("b")
+    assert len(store) == 2
+
+
+def test_max_sessions_drops_least_recently_used(store):
+    for sid in ("a", "b", "c"):
+        store.get(sid)
+    store.get("a")  # b is now the least recently used
+    store.get("d")
+    assert len(store) == 3
+    assert store.peek("b") is None
+    assert all(store.peek(sid) is not None for sid in ("a", "c", "d"))
+
+
+def test_max_sessions_never_drops_the_webcam_session(store):
+    store.get(LOCAL_SESSION)
+    for sid in ("a", "b", "c", "d"):
+        store.get(sid)
+    assert store.peek(LOCAL_SESSION) is not None
+    assert len(store) == 3
+
+
+def test_idle_sessions_expire(store):
+    local, idle, active = store.get(LOCAL_SESSION), store.get("idle"), store.get("active")
+    now = active.last_seen
+    idle.last_seen = local.last_seen = now - 120.0
+
+    assert store.evict_idle(now) == 1
+    assert store.peek("idle") is None
+    assert store.peek("active") is active
+    assert store.peek(LOCAL_SESSION) is local
+
+
+def test_get_sweeps_idle_sessions():
+    store = SessionStore(majority, idle_timeout=60.0, sweep_interval=0.0)
+    store.get("idle").last_seen -= 120.0
+    store.get("other")
+    assert store.peek("idle") is None
+
+
+def test_peek_does_not_create(store):
+    assert store.peek("missing") is None
+    assert len(store) == 0
+
+
+def test_observe_updates_smoothed_emotion(store):
+    session = store.get("a")
+    session.observe("Happy", None, 0.9)
+    session.observe("Sad", None, 0.2, vote=False)
+    snapshot = session.snapshot()
+    assert snapshot['emotion'] == "Happy"
+    assert snapshot['confidence'] == 0.2
+    assert snapshot['observations'] == 2
+    assert session.version == 2
+
+
+def test_sessions_do_not_block_each_other(store):
+    busy, other = store.get("busy"), store.get("other")
+    done = threading.Event()
+
+    with busy.lock:
+        thread = threading.Thread(target=lambda: (other.set("Happy", 0.8), done.set()))
+        thread.start()
+        # Completes while another client's session is locked
+        assert done.wait(timeout=2.0)
+    thread.join()
+    assert other.snapshot()['emotion'] == "Happy"
+
+
+def test_concurrent_updates_to_one_session_are_not_lost(store, run_threads):
+    calls = 50
+
+    def call(i):
+        session = store.get("shared")
+        for _ in range(calls):
+            session.observe("Happy", None, 0.9)
+
+    run_threads(call, threads=8)
+    session = store.get("shared")
+    assert session.observations == 8 * calls
+    assert session.version == 8 * calls
+
+
+def test_concurrent_clients_respect_max_sessions(run_threads):
+    store = SessionStore(majority, max_sessions=20)
+
+    def call(i):
+        for n in range(25):
+            store.get(f"client-{i}-{n}").set("Neutral", 0.5)
+
+    run_threads(call)
+    assert len(store) == 20
+
+
+def test_wait_for_update_wakes_on_change(store):
+    session = store.get("a")
+    version = session.version
+    timer = threading.Timer(0.05, session.set, args=("Sad", 0.7))
+    timer.start()
+    assert session.wait_for_update(version, timeout=2.0) == version + 1
+    timer.join()
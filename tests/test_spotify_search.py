@@ -0,0 +1,86 @@
+import time
+
+import pytest
+
+spotipy = pytest.importorskip("spotipy")
+requests = pytest.importorskip("requests")
+
+import spotify_helper
+from spotify_helper import MAX_RETRIES, MAX_RETRY_AFTER
+
+
+def rate_limited(retry_after=None):
+    headers = {'Retry-After': str(retry_after)} if retry_after is not None else {}
+    return spotipy.SpotifyException(429, -1, "rate limited", headers=headers)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    # Retries without Retry-After back off from RETRY_BACKOFF
+    monkeypatch.setattr(spotify_helper, "RETRY_BACKOFF", 0.0)
+
+
+def test_slow_search_returns_partial_results(recommender, fake_spotify):
+    fake_spotify.delays["slow"] = 1.0
+    started = time.monotonic()
+    items = recommender._search_many([
+        ("fast", 'track', 5, "US", 0),
+        ("slow", 'track', 5, "US", 0),
+    ], deadline=0.2)
+    assert time.monotonic() - started < 0.8
+    assert len(items) == 5
+    assert all(item['id'].startswith("fast") for item in items)
+
+
+def test_failed_search_is_left_out(recommender, fake_spotify):
+    fake_spotify.errors.append(spotipy.SpotifyException(400, -1, "bad request"))
+    items = recommender._search_many([("a", 'track', 5, "US", 0)], deadline=1.0)
+    assert items == []
+
+
+def test_tracks_within_deadline_when_a_search_hangs(recommender, fake_spotify, monkeypatch):
+    monkeypatch.setattr(spotify_helper, "SEARCH_DEADLINE", 0.2)
+    for query in spotify_helper.EMOTION_TO_SEARCH["Happy"]:
+        fake_spotify.delays[query] = 1.0
+    started = time.monotonic()
+    assert recommender.get_tracks_for_emotion("Happy", limit=5, language="English") == []
+    assert time.monotonic() - started < 0.8
+
+
+def test_rate_limit_then_success(recommender, fake_spotify):
+    fake_spotify.errors.append(rate_limited(retry_after=0))
+    items = recommender._search("happy", 'track', 5, "US", 0)
+    assert len(items) == 5
+    assert fake_spotify.calls == 2
+
+
+def test_retry_after_is_honoured(recommender, fake_spotify):
+    fake_spotify.errors.append(rate_limited(retry_after=0.2))
+    started = time.monotonic()
+    recommender._search("happy", 'track', 5, "US", 0)
+    assert time.monotonic() - started >= 0.2
+
+
+def test_retry_after_above_cap_gives_up(recommender, fake_spotify):
+    fake_spotify.errors.append(rate_limited(retry_after=MAX_RETRY_AFTER + 50))
+    started = time.monotonic()
+    with pytest.raises(spotipy.SpotifyException):
+        recommender._search("happy", 'track', 5, "US", 0)
+    assert time.monotonic() - started < 1.0
+    assert fake_spotify.calls == 1
+    # Failures are not cached
+    assert len(recommender._search("happy", 'track', 5, "US", 0)) == 5
+
+
+def test_client_errors_are_not_retried(recommender, fake_spotify):
+    fake_spotify.errors.append(spotipy.SpotifyException(404, -1, "not found"))
+    with pytest.raises(spotipy.SpotifyException):
+        recommender._search("happy", 'track', 5, "US", 0)
+    assert fake_spotify.calls == 1
+
+
+def test_network_errors_retry_up_to_max(recommender, fake_spotify):
+    fake_spotify.errors.extend(requests.exceptions.ConnectionError("down") for _ in range(MAX_RETRIES + 1))
+    with pytest.raises(requests.exceptions.ConnectionError):
+        recommender._search("happy", 'track', 5, "US", 0)
+    assert fake_spotify.calls == MAX_RETRIES + 1
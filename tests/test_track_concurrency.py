@@ -0,0 +1,118 @@
+from collections import Counter
+
+import pytest
+
+pytest.importorskip("spotipy")
+
+from spotify_helper import SpotifyMoodRecommender, EMOTION_TO_SEARCH, MAX_TRACKS_PER_ARTIST
+
+THREADS = 16
+CALLS_PER_THREAD = 10
+SESSIONS = 8
+EMOTIONS = list(EMOTION_TO_SEARCH)
+
+
+def assert_valid(tracks, limit):
+    assert 0 < len(tracks) <= limit
+    uris = [t['uri'] for t in tracks]
+    assert len(uris) == len(set(uris))
+    assert max(Counter(t['artist'] for t in tracks).values()) <= MAX_TRACKS_PER_ARTIST
+
+
+@pytest.fixture
+def api_client(monkeypatch, fake_spotify):
+    """Flask test client with Spotify served by FakeSpotify, in-process mode"""
+    pytest.importorskip("flask")
+    pytest.importorskip("cv2")
+    import api_server
+
+    monkeypatch.setattr(api_server, "INFERENCE_SERVICE", None)
+    monkeypatch.setattr(api_server, "_spotify", SpotifyMoodRecommender(client=fake_spotify))
+    return api_server.app.test_client()
+
+
+def test_parallel_calls_return_valid_tracks(recommender, run_threads):
+    results = []
+
+    def call(i):
+        for n in range(CALLS_PER_THREAD):
+            emotion = EMOTIONS[(i + n) % len(EMOTIONS)]
+            results.append(recommender.get_tracks_for_emotion(emotion, limit=8, language="Mixed"))
+
+    run_threads(call, threads=THREADS)
+    assert len(results) == THREADS * CALLS_PER_THREAD
+    for tracks in results:
+        assert_valid(tracks, 8)
+
+
+def test_same_seed_same_result_under_concurrency(recommender, run_threads):
+    expected = {seed: recommender.get_tracks_for_emotion("Sad", limit=6, seed=seed) for seed in range(4)}
+    mismatches = []
+
+    def call(i):
+        for n in range(CALLS_PER_THREAD):
+            seed = (i + n) % 4
+            tracks = recommender.get_tracks_for_emotion("Sad", limit=6, seed=seed)
+            assert_valid(tracks, 6)
+            if tracks != expected[seed]:
+                mismatches.append(seed)
+
+    run_threads(call)
+    assert not mismatches
+
+
+def test_parallel_api_tracks_requests(api_client, run_threads):
+    client = api_client
+    responses = []
+
+    def call(i):
+        for n in range(CALLS_PER_THREAD):
+            response = client.post('/api/tracks', json={'emotion': 'Happy', 'language': 'Mixed', 'seed': 7},
+                                   headers={'X-Session-Id': f"thread-{i}-{n}"})
+            responses.append((response.status_code, response.get_json()))
+
+    run_threads(call)
+    first = responses[0][1]['tracks']
+    for status, body in responses:
+        assert status == 200
+        assert body['count'] == len(body['tracks'])
+        assert_valid(body['tracks'], 8)
+        # Fresh session each time, so the seed alone decides the selection
+        assert body['tracks'] == first
+
+
+@pytest.mark.parametrize("seed", [[1, 2], {'a': 1}, 1.5, True])
+def test_api_tracks_rejects_invalid_seed(api_client, seed):
+    response = api_client.post('/api/tracks', json={'emotion': 'Happy', 'seed': seed})
+    assert response.status_code == 400
+
+
+def test_parallel_sessions_never_repeat_within_a_session(recommender, run_threads):
+    served = {}
+
+    def call(i):
+        uris = []
+        for _ in range(3):
+            tracks = recommender.get_tracks_for_emotion("Happy", limit=8, session_id=f"session-{i}")
+            assert_valid(tracks, 8)
+            uris.extend(t['uri'] for t in tracks)
+        served[i] = uris
+
+    run_threads(call, threads=SESSIONS)
+    assert len(served) == SESSIONS
+    for uris in served.values():
+        assert len(uris) == len(set(uris))
+    assert len(recommender.history) == SESSIONS
+
+
+def test_pool_refresh_while_serving(recommender, run_threads):
+    recommender.refresh_pool("Sad", "Mixed")
+
+    def call(i):
+        for n in range(CALLS_PER_THREAD):
+            if i == 0:
+                recommender.refresh_pool("Sad", "Mixed")
+            else:
+                assert_valid(recommender.get_tracks_for_emotion("Sad", limit=8, seed=n), 8)
+
+    run_threads(call)
@@ -0,0 +1,98 @@
+import time
+
+import pytest
+
+pytest.importorskip("spotipy")
+
+from spotify_helper import TTLCache, EMOTION_TO_SEARCH, POOL_MAX_AGE_SECONDS
+
+QUERIES = len(EMOTION_TO_SEARCH["Sad"])
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_cache_hits_and_misses():
+    cache = TTLCache()
+    assert cache.get("key") is None
+    cache.set("key", [1])
+    assert cache.get("key") == [1]
+    assert cache.stats() == {'entries': 1, 'hits': 1, 'misses': 1, 'hit_ratio': 0.5}
+
+
+def test_cache_entries_expire():
+    cache = TTLCache(ttl=0.05)
+    cache.set("key", [1])
+    time.sleep(0.1)
+    assert cache.get("key") is None
+    assert len(cache) == 0
+
+
+def test_cache_drops_least_recently_used():
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_repeated_searches_are_served_from_cache(recommender, fake_spotify):
+    first = recommender._search("happy", 'track', 10, "US", 0)
+    assert recommender._search("happy", 'track', 10, "US", 0) == first
+    assert fake_spotify.calls == 1
+    assert recommender.cache.stats()['hits'] == 1
+
+
+def test_refresh_pool_bypasses_the_cache(recommender, fake_spotify):
+    assert recommender.refresh_pool("Sad", "Mixed") > 0
+    assert fake_spotify.calls == QUERIES
+    first = recommender.pools[("Sad", "Mixed")]
+
+    recommender.refresh_pool("Sad", "Mixed")
+    assert fake_spotify.calls == 2 * QUERIES
+    assert recommender.pools[("Sad", "Mixed")] is not first
+
+
+def test_warm_pool_serves_without_searching(recommender, fake_spotify):
+    recommender.refresh_pool("Sad", "Mixed")
+    calls = fake_spotify.calls
+    assert len(recommender.get_tracks_for_emotion("Sad", limit=8)) == 8
+    assert fake_spotify.calls == calls
+
+
+def test_stale_pool_falls_back_to_search(recommender, fake_spotify):
+    recommender.refresh_pool("Sad", "Mixed")
+    fetched, candidates = recommender.pools[("Sad", "Mixed")]
+    recommender.pools[("Sad", "Mixed")] = (fetched - POOL_MAX_AGE_SECONDS - 1, candidates)
+    calls = fake_spotify.calls
+
+    assert len(recommender.get_tracks_for_emotion("Sad", limit=8)) == 8
+    assert fake_spotify.calls > calls
+
+
+def test_prewarm_fills_and_refreshes_pools(recommender, fake_spotify):
+    recommender.start_prewarm(emotions=["Happy", "Sad"], languages=["Mixed"], interval=0.05, pause=0)
+    assert wait_until(lambda: len(recommender.pools) == 2)
+    first = {pair: fetched for pair, (fetched, _) in recommender.pools.items()}
+    assert wait_until(lambda: all(recommender.pools[pair][0] > fetched for pair, fetched in first.items()))
+    # Later rounds fetch again instead of re-reading cached results
+    assert fake_spotify.calls >= 4 * QUERIES
+
+    recommender.stop_prewarm()
+    calls = fake_spotify.calls
+    time.sleep(0.1)
+    assert fake_spotify.calls == calls
+
+
+def test_prewarm_survives_search_errors(recommender, fake_spotify):
+    fake_spotify.errors.append(ValueError("boom"))
+    recommender.start_prewarm(emotions=["Happy"], languages=["Mixed"], interval=0.01, pause=0)
+    assert wait_until(lambda: ("Happy", "Mixed") in recommender.pools)
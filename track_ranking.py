@@ -0,0 +1,114 @@
+import random
+
+import numpy as np
+
+
+def _album_art(album):
+    images = album.get('images') or []
+    if not images:
+        return None
+    art = next((img['url'] for img in images if img.get('height') == 300), None)
+    return art or images[0].get('url')
+
+
+class TrackCandidates:
+    """
+    Spotify track items parsed once into parallel columns
+
+    Output dicts are built up front; ranking only works on the numeric
+    columns (popularity, interned dedupe/artist/album ids), so a pool can
+    be parsed when it is fetched and then ranked cheaply on every request.
+    """
+
+    def __init__(self, items=()):
+        self.tracks = []
+        popularity, keys, artists, albums = [], [], [], []
+        key_ids, artist_ids, album_ids = {}, {}, {}
+
+        for t in items:
+            t = t or {}
+            name = t.get('name') or "Untitled"
+            artist_list = t.get('artists') or []
+            artist = (artist_list[0].get('name') if artist_list and artist_list[0] else "Unknown")
+            album = t.get('album') or {}
+            album_key = album.get('id') or f"{album.get('name') or ''}_{artist}"
+
+            self.tracks.append({
+                'name': name,
+                'artist': artist,
+                'album': album.get('name') or "",
+                'album_art': _album_art(album),
+                'preview_url': t.get('preview_url'),
+                'url': (t.get('external_urls') or {}).get('spotify') or "",
+                'uri': t.get('uri') or "",
+                'popularity': t.get('popularity', 0)
+            })
+
+            popularity.append(t.get('popularity') or 0)
+            keys.append(key_ids.setdefault(f"{name.lower()}_{artist.lower()}", len(key_ids)))
+            artists.append(artist_ids.setdefault(artist, len(artist_ids)))
+            albums.append(album_ids.setdefault(album_key, len(album_ids)))
+
+        self.popularity = np.asarray(popularity, dtype=np.float32)
+        self.key_id = np.asarray(keys, dtype=np.int32)
+        self.artist_id = np.asarray(artists, dtype=np.int32)
+        self.album_id = np.asarray(albums, dtype=np.int32)
+        self.uris = [t['uri'] for t in self.tracks]
+        self.num_keys = len(key_ids)
+        self.num_artists = len(artist_ids)
+        self.num_albums = len(album_ids)
+
+    def __len__(self):
+        return len(self.tracks)
+
+
+def select_tracks(candidates, limit, rng=None, jitter=20, max_per_artist=2, max_per_album=None, exclude=None):
+    """
+    Rank candidates by popularity plus random jitter and pick a diverse top-N
+
+    Args:
+        candidates: TrackCandidates to choose from
+        limit: Number of tracks to return
+        rng: random.Random driving the jitter and tie-breaking
+        jitter: Max +/- popularity adjustment per track
+        max_per_artist: Cap on tracks by the same (first) artist
+        max_per_album: Optional cap on tracks from the same album
+        exclude: Optional container of track URIs to skip (e.g. recently served)
+
+    Returns:
+        List of track dictionaries, best first
+    """
+    n = len(candidates)
+    if n == 0 or limit <= 0:
+        return []
+
+    gen = np.random.default_rng((rng or random).getrandbits(64))
+    scores = candidates.popularity + gen.integers(-jitter, jitter + 1, n)
+    # Highest score first; random tie-break instead of shuffling the items
+    order = np.lexsort((gen.random(n), -scores))
+
+    # Plain lists: scalar indexing into numpy arrays is slow in a Python loop
+    seen = [False] * candidates.num_keys
+    per_artist = [0] * candidates.num_artists
+    per_album = [0] * candidates.num_albums
+    key_id, artist_id, album_id = candidates.key_id.tolist(), candidates.artist_id.tolist(), candidates.album_id.tolist()
+    uris = candidates.uris
+
+    picked = []
+    for i in order.tolist():
+        k, a, b = key_id[i], artist_id[i], album_id[i]
+        if seen[k] or per_artist[a] >= max_per_artist:
+            continue
+        if max_per_album is not None and per_album[b] >= max_per_album:
+            continue
+        if exclude is not None and uris[i] and uris[i] in exclude:
+            continue
+
+        picked.append(i)
+        seen[k] = True
+        per_artist[a] += 1
+        per_album[b] += 1
+        if len(picked) >= limit:
+            break
+
+    return [dict(candidates.tracks[i]) for i in picked]